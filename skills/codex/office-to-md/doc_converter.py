@@ -9,73 +9,629 @@ import logging
 import tempfile
 import shutil
 import platform
+import socket
+import threading
+import time
+import weakref
+import signal
+import uuid
+import hashlib
+import asyncio
+import shlex
+import itertools
+import functools
+import multiprocessing.util
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Optional, Tuple
+from typing import Dict, Iterator, List, Optional, Tuple
 
-# 配置日志
-logging.basicConfig(level=logging.INFO)
+# UNO桥接（LibreOffice自带的python-uno），不可用时回退到命令行转换
+try:
+    import uno
+    from com.sun.star.beans import PropertyValue
+except ImportError:
+    uno = None
+    PropertyValue = None
+
+# 作为库使用时不配置根日志，由调用方决定日志级别
 logger = logging.getLogger(__name__)
 
+# 运行平台在进程内不会变化，导入时判断一次
+_IS_WINDOWS = platform.system() == "Windows"
+
+# 命令行转换的固定参数
+# --headless: 无界面模式（配合svp后端，无需xvfb等虚拟显示服务器）
+# --convert-to docx: 转换为docx格式
+# --outdir: 输出目录（后接目录和输入文件）
+_CONVERT_ARGS = ("--headless", "--convert-to", "docx", "--outdir")
+# .xls转换为.xlsx（供解析器从xlsx包中提取图片）
+_XLSX_CONVERT_ARGS = ("--headless", "--convert-to", "xlsx", "--outdir")
+
+# 预热用的最小文档：LibreOffice按内容识别格式，RTF内容保存为.doc也能走完整的导入/导出流程
+_WARMUP_DOC = b"{\\rtf1\\ansi warmup\\par}"
+
+
+class ConversionError(RuntimeError):
+    """文档转换失败"""
+
+
+def _find_free_port(host: str = "127.0.0.1") -> int:
+    """向系统申请一个空闲端口"""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind((host, 0))
+        return sock.getsockname()[1]
+
+
+@functools.lru_cache(maxsize=1)
+def _discover_libreoffice() -> Optional[str]:
+    """自动查找LibreOffice可执行文件（每个进程只查找一次）"""
+    # Windows常见路径
+    windows_paths = [
+        r"C:\Program Files\LibreOffice\program\soffice.exe",
+        r"C:\Program Files (x86)\LibreOffice\program\soffice.exe",
+        r"C:\Program Files\LibreOffice 7\program\soffice.exe",
+        r"C:\Program Files (x86)\LibreOffice 7\program\soffice.exe",
+    ]
+    
+    # Linux/Mac常见路径
+    unix_paths = [
+        "/usr/bin/libreoffice",
+        "/usr/bin/soffice",
+        "/usr/local/bin/libreoffice",
+        "/usr/local/bin/soffice",
+        "/Applications/LibreOffice.app/Contents/MacOS/soffice",
+    ]
+    
+    # 根据操作系统选择路径
+    if _IS_WINDOWS:
+        search_paths = windows_paths
+    else:
+        search_paths = unix_paths
+    
+    # 查找第一个存在的路径
+    for path in search_paths:
+        if os.path.exists(path):
+            return path
+    
+    # 从环境变量PATH中查找（只扫描PATH，不启动进程）
+    return shutil.which("soffice.exe" if _IS_WINDOWS else "soffice")
+
+
+def _process_group_kwargs() -> dict:
+    """让soffice在独立的进程组中运行，便于超时时连同soffice.bin子进程一起结束"""
+    if _IS_WINDOWS:
+        return {"creationflags": subprocess.CREATE_NEW_PROCESS_GROUP}
+    return {"start_new_session": True}
+
+
+def _kill_process_group(pid: int):
+    """强制结束进程及其所在进程组"""
+    try:
+        if _IS_WINDOWS:
+            subprocess.run(["taskkill", "/F", "/T", "/PID", str(pid)],
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        else:
+            os.killpg(pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+def _run_soffice(cmd: List[str], timeout: float, env: Optional[dict] = None,
+                 capture_stderr: bool = True) -> subprocess.CompletedProcess:
+    """
+    运行soffice命令，超时时结束整个进程组并抛出subprocess.TimeoutExpired
+    
+    soffice会派生soffice.bin，只结束直接子进程时soffice.bin会继续占用配置目录，
+    导致后续转换失败
+    """
+    process = subprocess.Popen(
+        cmd,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE if capture_stderr else subprocess.DEVNULL,
+        env=env,
+        **_process_group_kwargs()
+    )
+    try:
+        _, stderr = process.communicate(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        _kill_process_group(process.pid)
+        process.communicate()
+        raise
+    return subprocess.CompletedProcess(cmd, process.returncode, None, stderr or b"")
+
+
+def _unique_output_dirs(doc_paths: List[str], output_dir: Path) -> List[Path]:
+    """
+    为每个输入文件分配输出目录
+    
+    不同目录下的同名文件（如a/r.doc和b/r.doc）都会转换为r.docx，重复出现的文件名
+    （不区分大小写）放入output_dir下的编号子目录，避免互相覆盖
+    """
+    seen: Dict[str, int] = {}
+    output_dirs = []
+    for doc_path in doc_paths:
+        stem = Path(doc_path).stem.lower()
+        count = seen.get(stem, 0)
+        seen[stem] = count + 1
+        output_dirs.append(output_dir / str(count) if count else output_dir)
+    return output_dirs
+
+
+def _copy_file(src: Path, dst: Path):
+    """复制文件到临时文件再原子替换dst，dst已存在（包括是其他文件的硬链接）时不会改写其原内容"""
+    temp_file = dst.with_name(f".{dst.name}.{uuid.uuid4().hex}.tmp")
+    try:
+        shutil.copy2(src, temp_file)
+        os.replace(temp_file, dst)
+    except BaseException:
+        temp_file.unlink(missing_ok=True)
+        raise
+
+
+def _file_sha256(path: Path) -> str:
+    """分块计算文件内容的sha256，不把整个文件读入内存"""
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while chunk := f.read(65536):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _soffice_env(home_dir: str) -> dict:
+    """
+    构建soffice子进程的环境变量，不修改当前进程的os.environ
+    
+    - SAL_USE_VCLPLUGIN=svp: 软件渲染后端，配合--headless无需X服务器（调用方已设置时保留）
+    - HOME: 使用独立目录，避免读写真实用户目录（并发调用时会被锁住）
+    """
+    env = os.environ.copy()
+    if not _IS_WINDOWS:
+        env.setdefault('SAL_USE_VCLPLUGIN', 'svp')
+    env['HOME'] = home_dir
+    return env
+
+
+# 进程池中每个工作进程独占的LibreOffice配置目录及对应的环境变量
+_worker_profile_dir: Optional[str] = None
+_worker_env: Optional[dict] = None
+
+
+def _init_convert_worker():
+    """进程池初始化：为当前工作进程创建独立的UserInstallation，避免多个soffice争用默认配置"""
+    global _worker_profile_dir, _worker_env
+    _worker_profile_dir = tempfile.mkdtemp(prefix="lo_prof_")
+    _worker_env = _soffice_env(_worker_profile_dir)
+    # 工作进程通过os._exit退出，不会执行atexit，使用multiprocessing的Finalize清理
+    multiprocessing.util.Finalize(None, shutil.rmtree, args=(_worker_profile_dir,),
+                                  kwargs={"ignore_errors": True}, exitpriority=10)
+
+
+def _convert_in_worker(libreoffice_path: str, doc_path: str, output_dir: str,
+                       timeout: float = 60) -> Tuple[bool, str]:
+    """在工作进程中转换单个.doc文件"""
+    try:
+        doc_path = Path(doc_path)
+        if not doc_path.exists():
+            return False, f"文件不存在: {doc_path}"
+        
+        # 已经是docx，无需调用LibreOffice；复制一份，调用方删除结果时不影响原文件
+        if doc_path.suffix.lower() == '.docx':
+            output_file = Path(output_dir) / doc_path.name
+            _copy_file(doc_path, output_file)
+            return True, str(output_file)
+        
+        if doc_path.suffix.lower() != '.doc':
+            return False, f"文件格式不是.doc: {doc_path.suffix}"
+        
+        cmd = [
+            libreoffice_path,
+            f"-env:UserInstallation={Path(_worker_profile_dir).as_uri()}",
+            *_CONVERT_ARGS,
+            output_dir,
+            str(doc_path)
+        ]
+        result = _run_soffice(cmd, timeout, env=_worker_env)
+        if result.returncode != 0:
+            return False, f"转换失败: {result.stderr.decode('utf-8', 'replace')}"
+        
+        output_file = Path(output_dir) / f"{doc_path.stem}.docx"
+        if not output_file.exists():
+            return False, f"转换后的文件未生成: {output_file}"
+        
+        return True, str(output_file)
+        
+    except subprocess.TimeoutExpired:
+        return False, f"转换超时（超过{timeout}秒）"
+    except Exception as e:
+        return False, f"转换出错: {str(e)}"
+
+
+class _DaemonPool:
+    """常驻的LibreOffice进程，通过UNO socket复用，避免每次转换都冷启动soffice"""
+    
+    def __init__(self, libreoffice_path: str, host: str = "127.0.0.1",
+                 port: Optional[int] = None, startup_timeout: float = 30,
+                 env: Optional[dict] = None):
+        """
+        Args:
+            libreoffice_path: LibreOffice可执行文件路径
+            host: 监听地址
+            port: 监听端口，如果为None则自动选择空闲端口（避免多个实例争用同一端口）
+            startup_timeout: 等待端口就绪的最长时间（秒）
+            env: 守护进程的环境变量，如果为None则继承当前进程
+        """
+        self.libreoffice_path = libreoffice_path
+        self.env = env
+        self.host = host
+        self.port = port or _find_free_port(host)
+        self.startup_timeout = startup_timeout
+        self.profile_dir = Path(tempfile.gettempdir()) / f"lo_profile_{os.getpid()}_{self.port}"
+        self._process = None
+        self._desktop = None
+        self._lock = threading.Lock()
+    
+    def start(self):
+        """启动soffice守护进程并等待端口就绪"""
+        if self._process is not None and self._process.poll() is None:
+            return
+        
+        cmd = [
+            str(self.libreoffice_path),
+            "--headless",
+            "--invisible",
+            "--nologo",
+            "--norestore",
+            f"--accept=socket,host={self.host},port={self.port};urp;",
+            f"-env:UserInstallation={self.profile_dir.as_uri()}",
+        ]
+        self._process = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                                         env=self.env, **_process_group_kwargs())
+        
+        deadline = time.monotonic() + self.startup_timeout
+        while time.monotonic() < deadline:
+            if self._process.poll() is not None:
+                raise RuntimeError(f"LibreOffice守护进程启动失败，返回码: {self._process.returncode}")
+            try:
+                with socket.create_connection((self.host, self.port), timeout=1):
+                    logger.info("LibreOffice守护进程已就绪: %s:%s", self.host, self.port)
+                    return
+            except OSError:
+                time.sleep(0.2)
+        
+        self.shutdown()
+        raise RuntimeError(f"等待LibreOffice守护进程超时（超过{self.startup_timeout}秒）")
+    
+    def _connect(self):
+        """通过UNO连接守护进程，返回Desktop对象"""
+        local_ctx = uno.getComponentContext()
+        resolver = local_ctx.ServiceManager.createInstanceWithContext(
+            "com.sun.star.bridge.UnoUrlResolver", local_ctx)
+        ctx = resolver.resolve(
+            f"uno:socket,host={self.host},port={self.port};urp;StarOffice.ComponentContext")
+        return ctx.ServiceManager.createInstanceWithContext("com.sun.star.frame.Desktop", ctx)
+    
+    def convert(self, doc_path: Path, output_file: Path, timeout: Optional[float] = None):
+        """
+        通过UNO将文档另存为docx，失败时抛出异常
+        
+        UNO调用本身没有超时，在工作线程中执行并最多等待timeout秒；超时（如文档卡死或弹出密码框）
+        时结束守护进程并抛出TimeoutError，下次调用时重新启动，避免阻塞之后的所有转换
+        """
+        with self._lock:
+            if self._desktop is None:
+                self.start()
+                self._desktop = self._connect()
+            
+            desktop = self._desktop
+            outcome = {}
+            
+            def run():
+                try:
+                    self._store(desktop, doc_path, output_file)
+                except BaseException as e:
+                    outcome["error"] = e
+            
+            worker = threading.Thread(target=run, name="uno-convert", daemon=True)
+            worker.start()
+            worker.join(timeout)
+            if worker.is_alive():
+                logger.warning("UNO转换超时（超过%s秒），重启LibreOffice守护进程: %s", timeout, doc_path)
+                self.shutdown()
+                raise TimeoutError(f"转换超时（超过{timeout}秒）")
+            if "error" in outcome:
+                # 桥接可能已断开，下次调用时重新连接
+                self._desktop = None
+                raise outcome["error"]
+    
+    @staticmethod
+    def _store(desktop, doc_path: Path, output_file: Path):
+        """通过desktop打开文档并另存为docx"""
+        document = desktop.loadComponentFromURL(
+            uno.systemPathToFileUrl(str(doc_path.resolve())),
+            "_blank", 0, (PropertyValue("Hidden", 0, True, 0),))
+        if document is None:
+            raise RuntimeError(f"LibreOffice无法打开文件: {doc_path}")
+        
+        try:
+            document.storeToURL(
+                uno.systemPathToFileUrl(str(output_file.resolve())),
+                (PropertyValue("FilterName", 0, "MS Word 2007 XML", 0),))
+        finally:
+            document.close(True)
+    
+    def shutdown(self):
+        """结束守护进程（连同其派生的soffice.bin所在的整个进程组）并删除其配置目录"""
+        process, self._process = self._process, None
+        self._desktop = None
+        if process is not None:
+            if process.poll() is None:
+                _kill_process_group(process.pid)
+            process.wait()
+        shutil.rmtree(self.profile_dir, ignore_errors=True)
+
+
+def _release_converter(daemons: List[_DaemonPool], prewarm_processes: List[subprocess.Popen],
+                       profile_dir: str):
+    """结束DocConverter启动的预热进程和守护进程并删除配置目录（由weakref.finalize调用，不引用实例本身）"""
+    for process in list(prewarm_processes):
+        if process.poll() is None:
+            _kill_process_group(process.pid)
+    for daemon in daemons:
+        daemon.shutdown()
+    shutil.rmtree(profile_dir, ignore_errors=True)
+
 
 class DocConverter:
     """DOC到DOCX转换器"""
     
-    def __init__(self, libreoffice_path: Optional[str] = None):
+    def __init__(self, libreoffice_path: Optional[str] = None, use_daemon: bool = True,
+                 min_timeout: float = 10, sec_per_mb: float = 5, base_timeout: float = 15,
+                 prewarm: bool = False, use_cache: bool = False, cache_dir: Optional[str] = None,
+                 cache_max_bytes: int = 512 << 20, daemon_count: int = 1):
         """
         初始化转换器
         
+        构造时不启动LibreOffice：常驻进程在第一次转换.doc时才启动，只解析其他格式时没有启动开销。
+        使用完毕后调用close()（或使用with语句）结束常驻进程并删除配置目录；未调用时在实例被回收
+        或解释器退出时清理
+        
         Args:
             libreoffice_path: LibreOffice可执行文件路径，如果为None则自动检测
+            use_daemon: 是否使用常驻LibreOffice进程（需要python-uno），不可用时回退到命令行转换
+            min_timeout: 单个文件转换的最短超时时间（秒）
+            sec_per_mb: 每MB文件大小增加的超时时间（秒）
+            base_timeout: 超时时间的固定部分（秒）
+            prewarm: 是否在后台线程中预先转换一个小文档，提前完成配置目录、字体缓存和过滤器的初始化，
+                避免第一次真实转换承担冷启动开销。预热进程在close()或解释器退出时会被结束
+            use_cache: 是否按文件内容（sha256）缓存转换结果，重复的文档直接复用之前的结果
+            cache_dir: 缓存目录，如果为None则使用~/.cache/doc_converter
+            cache_max_bytes: 缓存目录的大小上限（字节），超出时按最近访问时间淘汰最旧的结果
+            daemon_count: 常驻LibreOffice进程的数量，每个进程同时只处理一个文档，
+                多线程调用时按轮询分配，允许同时转换daemon_count个文档；所有进程在第一次转换时同时启动
         """
-        self.libreoffice_path = libreoffice_path or self._find_libreoffice()
+        self.libreoffice_path = libreoffice_path or _discover_libreoffice()
         if not self.libreoffice_path:
             raise RuntimeError("未找到LibreOffice，请确保已安装LibreOffice")
         
-        logger.info(f"使用LibreOffice路径: {self.libreoffice_path}")
+        self.min_timeout = min_timeout
+        self.sec_per_mb = sec_per_mb
+        self.base_timeout = base_timeout
+        
+        logger.info("使用LibreOffice路径: %s", self.libreoffice_path)
+        
+        # 本实例专用的LibreOffice配置目录，不使用默认配置（否则会把转换交给其他已运行的实例，
+        # 并在转换完成前以返回码0退出）。同一配置目录同时只能被一个soffice使用
+        self._profile_dir = tempfile.mkdtemp(prefix="lo_uinst_")
+        self._profile_lock = threading.Lock()
+        
+        # aconvert使用的线程池，第一次调用时创建
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        
+        # 常驻进程在第一次转换.doc时启动（_ensure_daemons）
+        self._use_daemon = use_daemon and uno is not None
+        self._daemon_count = max(1, daemon_count)
+        self._daemons: List[_DaemonPool] = []
+        self._daemons_started = False
+        self._daemon_lock = threading.Lock()
+        self._daemon_cycle = None
+        # 正在运行的预热进程，close()时结束其进程组
+        self._prewarm_processes: List[subprocess.Popen] = []
+        self._state_lock = threading.Lock()
+        self._closed = False
+        # 调用方未显式close()时，在实例被回收或解释器退出时清理；finalize只持有下列对象而不持有self，
+        # 不会阻止实例被回收
+        self._finalizer = weakref.finalize(self, _release_converter, self._daemons,
+                                           self._prewarm_processes, self._profile_dir)
+        
+        # 转换结果缓存，键为输入文件内容的sha256
+        self.cache_max_bytes = cache_max_bytes
+        self._cache_dir = None
+        # 缓存目录的当前总大小，第一次写入缓存时扫描目录得到，之后增量维护
+        self._cache_size: Optional[int] = None
+        self._cache_lock = threading.Lock()
+        if use_cache:
+            self._cache_dir = Path(cache_dir or "~/.cache/doc_converter").expanduser()
+            self._cache_dir.mkdir(parents=True, exist_ok=True)
+        
+        # soffice子进程的环境变量只构建一次，通过env=传入，不修改全局os.environ（线程安全）
+        self._child_env = _soffice_env(self._profile_dir)
+        
+        # 使用本实例配置目录的转换命令前缀，调用时只需追加输出目录和输入文件
+        self._base_args = (
+            str(self.libreoffice_path),
+            f"-env:UserInstallation={Path(self._profile_dir).as_uri()}",
+            *_CONVERT_ARGS,
+        )
+        
+        if prewarm:
+            threading.Thread(target=self._prewarm, name="soffice-prewarm", daemon=True).start()
     
-    def _find_libreoffice(self) -> Optional[str]:
-        """自动查找LibreOffice可执行文件"""
-        # Windows常见路径
-        windows_paths = [
-            r"C:\Program Files\LibreOffice\program\soffice.exe",
-            r"C:\Program Files (x86)\LibreOffice\program\soffice.exe",
-            r"C:\Program Files\LibreOffice 7\program\soffice.exe",
-            r"C:\Program Files (x86)\LibreOffice 7\program\soffice.exe",
-        ]
+    def _ensure_daemons(self) -> bool:
+        """第一次调用时启动常驻进程，返回是否有可用的常驻进程"""
+        if not self._use_daemon:
+            return False
+        if not self._daemons_started:
+            with self._daemon_lock:
+                if not self._daemons_started and not self._closed:
+                    self._start_daemons()
+                    self._daemons_started = True
+        return bool(self._daemons)
+    
+    def _start_daemons(self):
+        """
+        启动常驻进程，多个文档共享一次启动开销；每个进程使用独立的端口和配置目录
         
-        # Linux/Mac常见路径
-        unix_paths = [
-            "/usr/bin/libreoffice",
-            "/usr/bin/soffice",
-            "/usr/local/bin/libreoffice",
-            "/usr/local/bin/soffice",
-            "/Applications/LibreOffice.app/Contents/MacOS/soffice",
-        ]
+        多个进程同时启动，总等待时间约等于单个进程的启动时间
+        """
+        daemons = [_DaemonPool(self.libreoffice_path, env=self._child_env)
+                   for _ in range(self._daemon_count)]
         
-        # 根据操作系统选择路径
-        if platform.system() == "Windows":
-            search_paths = windows_paths
+        def start(daemon: _DaemonPool) -> bool:
+            try:
+                daemon.start()
+                return True
+            except Exception as e:
+                logger.warning("LibreOffice守护进程启动失败: %s", e)
+                daemon.shutdown()
+                return False
+        
+        if len(daemons) == 1:
+            started = [start(daemons[0])]
         else:
-            search_paths = unix_paths
+            with ThreadPoolExecutor(max_workers=len(daemons), thread_name_prefix="soffice-start") as executor:
+                started = list(executor.map(start, daemons))
+        # 加入finalize持有的同一个列表，close()或实例被回收时一并结束
+        self._daemons.extend(daemon for daemon, ok in zip(daemons, started) if ok)
+        self._daemon_cycle = itertools.cycle(self._daemons)
+        if not self._daemons:
+            logger.warning("没有可用的LibreOffice守护进程，使用命令行转换")
+    
+    def close(self):
+        """结束本实例启动的守护进程和线程池，并删除配置目录；可重复调用"""
+        with self._state_lock:
+            if self._closed:
+                return
+            self._closed = True
+        # 等待正在进行的守护进程启动完成，再一并结束
+        with self._daemon_lock:
+            self._finalizer()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+    
+    def _prewarm(self):
+        """
+        提前启动常驻进程；不使用常驻进程时转换一个极小的文档，初始化本实例的配置目录
+        （持有配置锁，期间的真实转换会等待其完成）
+        """
+        if self._ensure_daemons():
+            return
+        try:
+            with tempfile.TemporaryDirectory(prefix="lo_warmup_") as temp_dir:
+                warmup_doc = Path(temp_dir) / "warmup.doc"
+                warmup_doc.write_bytes(_WARMUP_DOC)
+                cmd = [*self._base_args, temp_dir, str(warmup_doc)]
+                with self._profile_lock:
+                    # 保存进程引用，close()时可以结束仍在运行的预热进程组
+                    with self._state_lock:
+                        if self._closed:
+                            return
+                        process = subprocess.Popen(
+                            cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                            env=self._child_env, **_process_group_kwargs()
+                        )
+                        self._prewarm_processes.append(process)
+                    try:
+                        process.wait(timeout=max(self.min_timeout, self.base_timeout) * 4)
+                    except subprocess.TimeoutExpired:
+                        _kill_process_group(process.pid)
+                        process.wait()
+                        raise
+                    finally:
+                        with self._state_lock:
+                            self._prewarm_processes.remove(process)
+            logger.debug("LibreOffice预热完成")
+        except Exception as e:
+            logger.debug("LibreOffice预热失败: %s", e)
+    
+    def _cache_lookup(self, doc_path: Path, output_file: Path) -> Tuple[Optional[Path], bool]:
+        """
+        按内容查找缓存的转换结果，命中时复制到output_file（修改或删除输出文件不影响缓存）
         
-        # 查找第一个存在的路径
-        for path in search_paths:
-            if os.path.exists(path):
-                return path
+        Returns:
+            (缓存文件路径，未启用缓存时为None；是否命中)
+        """
+        if self._cache_dir is None:
+            return None, False
+        cache_file = self._cache_dir / f"{_file_sha256(doc_path)}.docx"
+        try:
+            os.utime(cache_file)
+            _copy_file(cache_file, output_file)
+        except FileNotFoundError:
+            # 未缓存，或刚被其他线程/进程淘汰，正常转换
+            return cache_file, False
+        logger.info("命中转换缓存: %s", output_file)
+        return cache_file, True
+    
+    def _cache_store(self, cache_file: Path, output_file: Path):
+        """
+        把转换结果复制到缓存（先写临时文件再原子替换），超出大小上限时淘汰最久未访问的结果
         
-        # 尝试从环境变量PATH中查找
+        使用复制而不是硬链接，调用方就地修改输出文件不会影响缓存内容
+        """
         try:
-            result = subprocess.run(
-                ["soffice", "--version"] if platform.system() != "Windows" else ["soffice.exe", "--version"],
-                capture_output=True,
-                timeout=5
-            )
-            if result.returncode == 0:
-                return "soffice" if platform.system() != "Windows" else "soffice.exe"
-        except:
-            pass
+            old_size = cache_file.stat().st_size if cache_file.exists() else 0
+            _copy_file(output_file, cache_file)
+            new_size = cache_file.stat().st_size
+        except OSError as e:
+            logger.warning("写入转换缓存失败: %s", e)
+            return
         
-        return None
+        with self._cache_lock:
+            if self._cache_size is None:
+                self._cache_size = sum(size for _, size, _ in self._cache_entries())
+            else:
+                self._cache_size += new_size - old_size
+            if self._cache_size <= self.cache_max_bytes:
+                return
+            
+            # 重新扫描（其他进程也可能写入同一缓存目录），一次淘汰到上限的90%，避免每次写入都触发淘汰
+            entries = self._cache_entries()
+            total = sum(size for _, size, _ in entries)
+            target = self.cache_max_bytes * 9 // 10
+            for _, size, path in sorted(entries):
+                if total <= target:
+                    break
+                try:
+                    os.unlink(path)
+                except OSError:
+                    continue
+                total -= size
+            self._cache_size = total
+    
+    def _cache_entries(self) -> List[Tuple[float, int, str]]:
+        """列出缓存目录中的转换结果：(最近访问时间, 大小, 路径)"""
+        entries = []
+        for entry in os.scandir(self._cache_dir):
+            if entry.name.endswith('.docx') and entry.is_file():
+                stat = entry.stat()
+                entries.append((stat.st_atime, stat.st_size, entry.path))
+        return entries
+    
+    def _timeout_for(self, doc_path) -> float:
+        """根据文件大小计算转换超时时间，大文件给足时间，小文件卡住时尽快放弃"""
+        try:
+            size_mb = Path(doc_path).stat().st_size / (1 << 20)
+        except OSError:
+            size_mb = 0
+        return max(self.min_timeout, int(size_mb * self.sec_per_mb) + self.base_timeout)
     
     def convert_doc_to_docx(self, doc_path: str, output_dir: Optional[str] = None) -> Tuple[bool, str]:
         """
@@ -83,107 +639,479 @@ class DocConverter:
         
         Args:
             doc_path: 输入的.doc文件路径
-            output_dir: 输出目录，如果为None则使用临时目录
+            output_dir: 输出目录，如果为None则为本次转换单独创建临时目录（转换失败时自动删除，
+                成功时由调用方在使用后删除）
             
         Returns:
-            (成功标志, 转换后的docx文件路径或错误信息)
+            (成功标志, 转换后的docx文件路径或错误信息)；
+            输入已经是.docx时返回的是复制到输出目录中的副本，删除结果不会影响原文件
         """
+        if output_dir is not None:
+            return self._convert_doc_to_docx(doc_path, output_dir)
+        
+        temp_dir = tempfile.mkdtemp(prefix="doc2docx_")
+        success = False
+        try:
+            success, result = self._convert_doc_to_docx(doc_path, temp_dir)
+            return success, result
+        finally:
+            if not success:
+                shutil.rmtree(temp_dir, ignore_errors=True)
+    
+    @contextmanager
+    def converted_docx(self, doc_path: str) -> Iterator[Path]:
+        """
+        将.doc文件转换为.docx，在with块内提供转换结果的路径，退出时删除临时文件
+        
+        结果直接由LibreOffice写入临时目录，不额外复制或读入内存：
+            with converter.converted_docx("a.doc") as docx_path:
+                document = docx.Document(str(docx_path))
+        
+        Args:
+            doc_path: 输入的.doc文件路径
+            
+        Raises:
+            ConversionError: 转换失败
+        """
+        with tempfile.TemporaryDirectory(prefix="doc2docx_") as temp_dir:
+            success, result = self._convert_doc_to_docx(doc_path, temp_dir)
+            if not success:
+                raise ConversionError(result)
+            yield Path(result)
+    
+    def convert_doc_to_docx_stream(self, doc_path: str) -> bytes:
+        """
+        将.doc文件转换为.docx并返回文件内容，临时文件在返回前删除
+        
+        Args:
+            doc_path: 输入的.doc文件路径
+            
+        Returns:
+            转换后的docx文件内容
+            
+        Raises:
+            ConversionError: 转换失败
+        """
+        with self.converted_docx(doc_path) as docx_path:
+            return docx_path.read_bytes()
+    
+    def _convert_doc_to_docx(self, doc_path: str, output_dir: str) -> Tuple[bool, str]:
+        """将.doc文件转换到指定的输出目录"""
         try:
             doc_path = Path(doc_path)
             if not doc_path.exists():
                 return False, f"文件不存在: {doc_path}"
             
+            # 已经是docx，无需调用LibreOffice；复制一份，调用方删除结果时不影响原文件
+            if doc_path.suffix.lower() == '.docx':
+                output_dir = Path(output_dir)
+                output_dir.mkdir(parents=True, exist_ok=True)
+                output_file = output_dir / doc_path.name
+                _copy_file(doc_path, output_file)
+                return True, str(output_file)
+            
             if doc_path.suffix.lower() != '.doc':
                 return False, f"文件格式不是.doc: {doc_path.suffix}"
             
             # 确定输出目录
-            if output_dir is None:
-                output_dir = tempfile.gettempdir()
             output_dir = Path(output_dir)
             output_dir.mkdir(parents=True, exist_ok=True)
             
-            logger.info(f"开始转换: {doc_path.name}")
-            logger.info(f"输出目录: {output_dir}")
+            if logger.isEnabledFor(logging.INFO):
+                logger.info("开始转换: %s", doc_path.name)
+                logger.info("输出目录: %s", output_dir)
+            
+            # 确定输出文件路径
+            output_file = output_dir / f"{doc_path.stem}.docx"
+            
+            # 相同内容的文档已转换过时直接复用缓存结果
+            cache_file, cache_hit = self._cache_lookup(doc_path, output_file)
+            if cache_hit:
+                return True, str(output_file)
+            
+            # 优先通过常驻进程转换（第一次转换时启动），失败时回退到命令行
+            if self._ensure_daemons():
+                try:
+                    next(self._daemon_cycle).convert(doc_path, output_file, self._timeout_for(doc_path))
+                    if output_file.exists():
+                        logger.info("转换成功: %s", output_file)
+                        if cache_file is not None:
+                            self._cache_store(cache_file, output_file)
+                        return True, str(output_file)
+                except TimeoutError as e:
+                    # 卡住的文档用命令行转换同样会卡住，不再重试
+                    logger.error("转换超时: %s", doc_path)
+                    return False, str(e)
+                except Exception as e:
+                    logger.warning("UNO转换失败，回退到命令行转换: %s", e)
             
             # 构建LibreOffice命令
-            # --headless: 无界面模式
-            # --convert-to docx: 转换为docx格式
-            # --outdir: 输出目录
-            
-            # Linux环境优化：优先使用xvfb-run以支持无显示服务器环境
-            use_xvfb = False
-            if platform.system() != "Windows":
-                # 设置环境变量以支持无头服务器
-                os.environ['SAL_USE_VCLPLUGIN'] = 'svp'
-                
-                # 检查是否有xvfb-run（更稳定）
-                if shutil.which("xvfb-run"):
-                    use_xvfb = True
-                    logger.info("检测到xvfb-run，使用虚拟显示服务器")
-            
-            if use_xvfb:
-                cmd = [
-                    "xvfb-run",
-                    "-a",  # 自动选择显示编号
-                    str(self.libreoffice_path),
-                    "--headless",
-                    "--convert-to",
-                    "docx",
-                    "--outdir",
-                    str(output_dir),
-                    str(doc_path)
-                ]
-            else:
-                cmd = [
-                    str(self.libreoffice_path),
-                    "--headless",
-                    "--convert-to",
-                    "docx",
-                    "--outdir",
-                    str(output_dir),
-                    str(doc_path)
-                ]
-            
-            logger.info(f"执行命令: {' '.join(cmd)}")
+            cmd = [*self._base_args, str(output_dir), str(doc_path)]
+            
+            if logger.isEnabledFor(logging.INFO):
+                logger.info("执行命令: %s", shlex.join(cmd))
+            
+            timeout = self._timeout_for(doc_path)
             
             # 执行转换
-            result = subprocess.run(
-                cmd,
-                capture_output=True,
-                text=True,
-                timeout=60  # 60秒超时
-            )
+            # 成功时soffice的输出没有用处，只在失败时解码stderr
+            with self._profile_lock:
+                result = _run_soffice(cmd, timeout, env=self._child_env)
             
             if result.returncode != 0:
-                logger.error(f"转换失败，返回码: {result.returncode}")
-                logger.error(f"错误输出: {result.stderr}")
-                return False, f"转换失败: {result.stderr}"
-            
-            # 确定输出文件路径
-            output_file = output_dir / f"{doc_path.stem}.docx"
+                stderr = result.stderr.decode("utf-8", "replace")
+                logger.error("转换失败，返回码: %d", result.returncode)
+                logger.error("错误输出: %s", stderr)
+                return False, f"转换失败: {stderr}"
             
             if not output_file.exists():
                 return False, f"转换后的文件未生成: {output_file}"
             
-            logger.info(f"转换成功: {output_file}")
-            logger.info(f"文件大小: {output_file.stat().st_size} bytes")
+            logger.info("转换成功: %s", output_file)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("文件大小: %d bytes", output_file.stat().st_size)
+            
+            if cache_file is not None:
+                self._cache_store(cache_file, output_file)
             
             return True, str(output_file)
             
         except subprocess.TimeoutExpired:
             logger.error("转换超时")
-            return False, "转换超时（超过60秒）"
+            return False, f"转换超时（超过{timeout}秒）"
+        except Exception as e:
+            logger.error("转换过程出错: %s", e)
+            return False, f"转换出错: {str(e)}"
+    
+    def convert_xls_to_xlsx(self, xls_path: str, output_dir: str) -> Tuple[bool, str]:
+        """
+        将.xls文件通过命令行转换为.xlsx格式（常驻进程只配置了Word导出过滤器，不参与）
+        
+        Args:
+            xls_path: 输入的.xls文件路径
+            output_dir: 输出目录
+            
+        Returns:
+            (成功标志, 转换后的xlsx文件路径或错误信息)
+        """
+        timeout = None
+        try:
+            xls_path = Path(xls_path)
+            if not xls_path.exists():
+                return False, f"文件不存在: {xls_path}"
+            if xls_path.suffix.lower() != '.xls':
+                return False, f"文件格式不是.xls: {xls_path.suffix}"
+            
+            output_dir = Path(output_dir)
+            output_dir.mkdir(parents=True, exist_ok=True)
+            output_file = output_dir / f"{xls_path.stem}.xlsx"
+            
+            cmd = [
+                str(self.libreoffice_path),
+                f"-env:UserInstallation={Path(self._profile_dir).as_uri()}",
+                *_XLSX_CONVERT_ARGS,
+                str(output_dir),
+                str(xls_path),
+            ]
+            timeout = self._timeout_for(xls_path)
+            with self._profile_lock:
+                result = _run_soffice(cmd, timeout, env=self._child_env)
+            
+            if result.returncode != 0:
+                return False, f"转换失败: {result.stderr.decode('utf-8', 'replace')}"
+            if not output_file.exists():
+                return False, f"转换后的文件未生成: {output_file}"
+            
+            logger.info("转换成功: %s", output_file)
+            return True, str(output_file)
+            
+        except subprocess.TimeoutExpired:
+            return False, f"转换超时（超过{timeout}秒）"
+        except Exception as e:
+            return False, f"转换出错: {str(e)}"
+    
+    async def aconvert(self, doc_path: str, output_dir: Optional[str] = None) -> Tuple[bool, str]:
+        """
+        在线程池中执行convert_doc_to_docx，供异步服务调用而不阻塞事件循环
+        
+        与aconvert_doc_to_docx不同，本方法复用常驻进程、已预热的配置目录和转换缓存
+        
+        Args:
+            doc_path: 输入的.doc文件路径
+            output_dir: 输出目录，如果为None则为本次转换单独创建临时目录
+            
+        Returns:
+            (成功标志, 转换后的docx文件路径或错误信息)
+        """
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=os.cpu_count() or 1,
+                                                        thread_name_prefix="doc2docx")
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor, self.convert_doc_to_docx, doc_path, output_dir)
+    
+    async def aconvert_doc_to_docx(self, doc_path: str, output_dir: Optional[str] = None) -> Tuple[bool, str]:
+        """
+        异步将.doc文件转换为.docx格式，等待soffice时不阻塞事件循环
+        
+        每次调用使用独立的UserInstallation，因此多个调用可以并发执行（不经过常驻进程）
+        
+        Args:
+            doc_path: 输入的.doc文件路径
+            output_dir: 输出目录，如果为None则为本次转换单独创建临时目录（转换失败时自动删除）
+            
+        Returns:
+            (成功标志, 转换后的docx文件路径或错误信息)；输入已经是.docx时同样返回复制到输出目录中的副本
+        """
+        if output_dir is not None:
+            return await self._aconvert_doc_to_docx(doc_path, output_dir)
+        
+        temp_dir = tempfile.mkdtemp(prefix="doc2docx_")
+        success = False
+        try:
+            success, result = await self._aconvert_doc_to_docx(doc_path, temp_dir)
+            return success, result
+        finally:
+            if not success:
+                shutil.rmtree(temp_dir, ignore_errors=True)
+    
+    async def aconvert_many(self, doc_paths: List[str], output_dir: Optional[str] = None,
+                            max_concurrency: Optional[int] = None) -> List[Tuple[bool, str]]:
+        """
+        异步并发转换多个.doc文件
+        
+        Args:
+            doc_paths: 输入的.doc文件路径列表
+            output_dir: 输出目录，如果为None则每个文件使用单独的临时目录；
+                不同目录下的同名文件放入output_dir下的编号子目录
+            max_concurrency: 同时运行的soffice进程数，如果为None则使用CPU核数
+            
+        Returns:
+            与doc_paths一一对应的(成功标志, 转换后的docx文件路径或错误信息)列表
+        """
+        semaphore = asyncio.Semaphore(max_concurrency or os.cpu_count() or 1)
+        if output_dir is None:
+            output_dirs = [None] * len(doc_paths)
+        else:
+            output_dirs = [str(d) for d in _unique_output_dirs(doc_paths, Path(output_dir))]
+        
+        async def convert_one(doc_path: str, doc_output_dir: Optional[str]) -> Tuple[bool, str]:
+            async with semaphore:
+                return await self.aconvert_doc_to_docx(doc_path, doc_output_dir)
+        
+        return list(await asyncio.gather(*map(convert_one, doc_paths, output_dirs)))
+    
+    async def _aconvert_doc_to_docx(self, doc_path: str, output_dir: str) -> Tuple[bool, str]:
+        """异步将.doc文件转换到指定的输出目录"""
+        doc_path = Path(doc_path)
+        if not doc_path.exists():
+            return False, f"文件不存在: {doc_path}"
+        
+        if doc_path.suffix.lower() == '.docx':
+            return self._convert_doc_to_docx(str(doc_path), output_dir)
+        
+        if doc_path.suffix.lower() != '.doc':
+            return False, f"文件格式不是.doc: {doc_path.suffix}"
+        
+        output_dir = Path(output_dir)
+        output_dir.mkdir(parents=True, exist_ok=True)
+        output_file = output_dir / f"{doc_path.stem}.docx"
+        
+        # 并发运行的soffice必须使用各自的配置目录，否则会交给已运行的实例处理并提前退出
+        profile_dir = Path(tempfile.gettempdir()) / f"lo_uinst_{uuid.uuid4().hex}"
+        cmd = [
+            str(self.libreoffice_path),
+            f"-env:UserInstallation={profile_dir.as_uri()}",
+            *_CONVERT_ARGS,
+            str(output_dir),
+            str(doc_path)
+        ]
+        timeout = self._timeout_for(doc_path)
+        
+        try:
+            process = await asyncio.create_subprocess_exec(
+                *cmd,
+                stdout=asyncio.subprocess.DEVNULL,
+                stderr=asyncio.subprocess.PIPE,
+                env={**self._child_env, "HOME": str(profile_dir)},
+                **_process_group_kwargs()
+            )
+            try:
+                _, stderr = await asyncio.wait_for(process.communicate(), timeout=timeout)
+            except asyncio.TimeoutError:
+                _kill_process_group(process.pid)
+                await process.wait()
+                logger.error("转换超时")
+                return False, f"转换超时（超过{timeout}秒）"
+            except BaseException:
+                # 任务被取消（或其他异常）时同样结束soffice进程组，否则它会在后台继续运行
+                _kill_process_group(process.pid)
+                raise
+            
+            if process.returncode != 0:
+                stderr = stderr.decode("utf-8", "replace")
+                logger.error("转换失败，返回码: %d", process.returncode)
+                return False, f"转换失败: {stderr}"
+            
+            if not output_file.exists():
+                return False, f"转换后的文件未生成: {output_file}"
+            
+            logger.info("转换成功: %s", output_file)
+            return True, str(output_file)
+            
         except Exception as e:
-            logger.error(f"转换过程出错: {str(e)}")
+            logger.error("转换过程出错: %s", e)
             return False, f"转换出错: {str(e)}"
+        finally:
+            shutil.rmtree(profile_dir, ignore_errors=True)
+    
+    def convert_many(self, doc_paths: List[str], output_dir: Optional[str] = None,
+                     batch_size: int = 10) -> List[Tuple[bool, str]]:
+        """
+        批量转换.doc文件，每批文件只启动一次soffice
+        
+        Args:
+            doc_paths: 输入的.doc文件路径列表
+            output_dir: 输出目录，如果为None则为本次调用创建临时目录；
+                不同目录下的同名文件放入output_dir下的编号子目录
+            batch_size: 每次soffice调用转换的文件数
+            
+        Returns:
+            与doc_paths一一对应的(成功标志, 转换后的docx文件路径或错误信息)列表
+        """
+        if output_dir is None:
+            output_dir = tempfile.mkdtemp(prefix="doc2docx_")
+        output_dirs = _unique_output_dirs(doc_paths, Path(output_dir))
+        
+        # 常驻进程已经分摊了启动开销，逐个转换即可
+        if self._ensure_daemons():
+            return [self.convert_doc_to_docx(doc_path, str(doc_output_dir))
+                    for doc_path, doc_output_dir in zip(doc_paths, output_dirs)]
+        
+        # 同一次soffice调用只能写入一个输出目录，按输出目录分组后再分批
+        groups: Dict[Path, List[int]] = {}
+        for i, doc_output_dir in enumerate(output_dirs):
+            groups.setdefault(doc_output_dir, []).append(i)
+        
+        results: List[Optional[Tuple[bool, str]]] = [None] * len(doc_paths)
+        for doc_output_dir, indices in groups.items():
+            doc_output_dir.mkdir(parents=True, exist_ok=True)
+            remaining = iter(indices)
+            while True:
+                batch = list(itertools.islice(remaining, max(1, batch_size)))
+                if not batch:
+                    break
+                batch_results = self._convert_batch([doc_paths[i] for i in batch], doc_output_dir)
+                for i, result in zip(batch, batch_results):
+                    results[i] = result
+        
+        return results
+    
+    def convert_parallel(self, doc_paths: List[str], output_dir: Optional[str] = None,
+                         workers: Optional[int] = None) -> List[Tuple[bool, str]]:
+        """
+        使用进程池并行转换多个.doc文件，每个工作进程使用独立的LibreOffice配置目录
+        
+        Args:
+            doc_paths: 输入的.doc文件路径列表
+            output_dir: 输出目录，如果为None则为本次调用创建临时目录；
+                不同目录下的同名文件放入output_dir下的编号子目录
+            workers: 工作进程数，如果为None则使用CPU核数
+            
+        Returns:
+            与doc_paths一一对应的(成功标志, 转换后的docx文件路径或错误信息)列表
+        """
+        if not doc_paths:
+            return []
+        
+        if output_dir is None:
+            output_dir = tempfile.mkdtemp(prefix="doc2docx_")
+        output_dirs = _unique_output_dirs(doc_paths, Path(output_dir))
+        for doc_output_dir in set(output_dirs):
+            doc_output_dir.mkdir(parents=True, exist_ok=True)
+        
+        workers = max(1, min(workers or os.cpu_count() or 1, len(doc_paths)))
+        chunksize = max(1, len(doc_paths) // (workers * 4))
+        
+        logger.info("并行转换%d个文件，工作进程数: %d", len(doc_paths), workers)
+        
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_convert_worker) as executor:
+            return list(executor.map(
+                _convert_in_worker,
+                itertools.repeat(str(self.libreoffice_path)),
+                [str(doc_path) for doc_path in doc_paths],
+                [str(doc_output_dir) for doc_output_dir in output_dirs],
+                [self._timeout_for(doc_path) for doc_path in doc_paths],
+                chunksize=chunksize
+            ))
+    
+    def _convert_batch(self, batch: List[str], output_dir: Path) -> List[Tuple[bool, str]]:
+        """在一次soffice调用中转换一批文件（与convert_doc_to_docx共用转换缓存），批次失败时逐个重试以定位出错文件"""
+        results: List[Optional[Tuple[bool, str]]] = [None] * len(batch)
+        pending = []
+        for i, doc_path in enumerate(batch):
+            doc_path = Path(doc_path)
+            if not doc_path.exists():
+                results[i] = (False, f"文件不存在: {doc_path}")
+            elif doc_path.suffix.lower() == '.docx':
+                results[i] = self._convert_doc_to_docx(str(doc_path), str(output_dir))
+            elif doc_path.suffix.lower() != '.doc':
+                results[i] = (False, f"文件格式不是.doc: {doc_path.suffix}")
+            else:
+                output_file = output_dir / f"{doc_path.stem}.docx"
+                cache_file, cache_hit = self._cache_lookup(doc_path, output_file)
+                if cache_hit:
+                    results[i] = (True, str(output_file))
+                else:
+                    pending.append((i, doc_path, output_file, cache_file))
+        
+        if not pending:
+            return results
+        
+        cmd = [*self._base_args, str(output_dir), *(str(doc_path) for _, doc_path, _, _ in pending)]
+        
+        logger.info("批量转换%d个文件", len(pending))
+        
+        timeout = sum(self._timeout_for(doc_path) for _, doc_path, _, _ in pending)
+        timed_out = False
+        try:
+            with self._profile_lock:
+                result = _run_soffice(cmd, timeout, env=self._child_env, capture_stderr=False)
+            batch_failed = result.returncode != 0
+            if batch_failed:
+                logger.warning("批量转换失败，返回码: %d，逐个重试", result.returncode)
+        except subprocess.TimeoutExpired:
+            # 超时被杀掉的批次中可能有未写完的文件，多个文件时整批逐个重试
+            logger.warning("批量转换超时（超过%s秒）", timeout)
+            batch_failed = timed_out = True
+        
+        for i, doc_path, output_file, cache_file in pending:
+            if batch_failed and len(pending) > 1:
+                results[i] = self.convert_doc_to_docx(str(doc_path), str(output_dir))
+            elif timed_out:
+                results[i] = (False, f"转换超时（超过{timeout}秒）")
+            elif batch_failed:
+                results[i] = (False, f"转换失败: {doc_path.name}")
+            elif output_file.exists():
+                if cache_file is not None:
+                    self._cache_store(cache_file, output_file)
+                results[i] = (True, str(output_file))
+            else:
+                results[i] = (False, f"转换后的文件未生成: {output_file}")
+        
+        return results
     
     def convert_and_cleanup(self, doc_path: str, keep_temp: bool = False) -> Tuple[bool, str]:
         """
-        转换doc文件并可选择性清理临时文件
+        转换doc文件到单独的临时目录，结果由调用方在使用后清理
+        
+        返回的docx总是本次转换新建的临时文件（输入已经是.docx时也是复制出的副本），
+        删除它不会影响输入文件
         
         Args:
             doc_path: 输入的.doc文件路径
-            keep_temp: 是否保留临时转换的docx文件
+            keep_temp: 是否保留临时转换的docx文件（仅影响日志提示，删除由调用方负责）
             
         Returns:
             (成功标志, 转换后的docx文件路径或错误信息)
@@ -193,9 +1121,8 @@ class DocConverter:
         if not success:
             return False, result_path
         
-        # 如果不保留临时文件，则在使用后自动清理（这个由调用方决定）
         if not keep_temp:
-            logger.info(f"临时文件将在使用后清理: {result_path}")
+            logger.info("临时文件需要在使用后清理: %s", result_path)
         
         return True, result_path
 
@@ -230,7 +1157,6 @@ def test_converter():
                 if success:
                     print(f"✓ 转换成功!")
                     print(f"  输出文件: {result}")
-                    print(f"  文件大小: {Path(result).stat().st_size} bytes")
                     converted = True
                     
                     # 验证文件可以被打开
@@ -268,5 +1194,6 @@ def test_converter():
 
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
     test_converter()
 
@@ -6,38 +6,25 @@ Now supports: docx, pdf, xlsx, xls, pptx (all cross-platform formats)
 
 import os
 import uuid
+import weakref
+import threading
+import shutil
+import struct
+import tempfile
+import zipfile
 import logging
 import re
+from operator import itemgetter
+from bisect import bisect_right
+from collections import Counter, OrderedDict
+from functools import lru_cache
 from pathlib import Path
-from typing import Dict, List, Tuple, Optional
+from typing import Dict, FrozenSet, List, Tuple, Optional
 from datetime import date, datetime, time
-import docx
-from docx.shared import Inches
-from docx.enum.text import WD_PARAGRAPH_ALIGNMENT
-import fitz  # PyMuPDF
-from PIL import Image
 import io
 
-# Import additional parsing libraries
-try:
-    from pptx import Presentation
-except ImportError:
-    Presentation = None
-
-try:
-    import openpyxl
-    from openpyxl import load_workbook
-    from openpyxl.utils.datetime import from_excel
-except ImportError:
-    openpyxl = None
-    from_excel = None
-
-try:
-    import xlrd
-    from xlrd import xldate_as_datetime
-except ImportError:
-    xlrd = None
-    xldate_as_datetime = None
+# 解析库（python-docx、PyMuPDF、PIL、python-pptx、openpyxl、xlrd）在用到它们的方法内导入，
+# 导入本模块时只加载实际处理的文件格式所需的库
 
 # Import doc converter
 try:
@@ -49,6 +36,180 @@ except ImportError:
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# 每个段落都会用到的预编译正则
+# 常见页码格式，合并为一个多选分支
+_PAGE_NUMBER_RE = re.compile('|'.join((
+    r'^第\s*\d+\s*页$',  # 第X页
+    r'^-\s*\d+\s*-$',     # -X-
+    r'^\d+\s*/\s*\d+$',  # X/Y
+    r'^Page\s+\d+$',     # Page X
+    r'^\d+\s+of\s+\d+$', # X of Y
+)), re.IGNORECASE)
+# 常见页眉页脚关键词，合并为一个不区分大小写的多选分支
+_FOOTER_KEYWORDS_RE = re.compile('|'.join(re.escape(k) for k in (
+    '\u7248\u6743\u6240\u6709', '\u4fdd\u7559\u6240\u6709\u6743\u5229', 'all rights reserved', 'copyright',
+    '\u673a\u5bc6', 'confidential', '\u5185\u90e8\u8d44\u6599',
+)), re.IGNORECASE)
+# 一次匹配列表项前缀："1. text"（有序列表）、"• text"（去掉项目符号），
+# 或其他"a) text"形式的标记（原样保留在无序列表项中）
+_LIST_ITEM_RE = re.compile(r'\s*(?:\d+[.)]\s+(?P<ordered>.+)|(?P<bullet>[•\-*])\s+|[\d\w]+[.)]\s+)')
+_MULTINL_RE = re.compile(r'\n+')
+_WS_RE = re.compile(r'\s+')
+_CAPITALIZED_TITLE_RE = re.compile(r'^[A-Z][^.!?]*$')
+_NUMBERED_TITLE_RE = re.compile(r'^\d+[\.\s]+[A-Z]')
+# 用一次str.translate转义Markdown表格单元格：换行转为<br>
+# （PDF文本在句中折行，转为空格），竖线转义
+_CELL_TRANS = str.maketrans({'\n': '<br>', '|': '\\|'})
+_PDF_CELL_TRANS = str.maketrans({'\n': ' ', '|': '\\|'})
+# xlsx包中的图片部件（扩展名不区分大小写）
+_XLSX_MEDIA_RE = re.compile(r'xl/media/.*\.(?P<ext>(?i:png|jpe?g|gif|bmp|webp))\Z')
+
+# xlsx媒体文件达到此数量时改用线程池提取，线程数不超过_MAX_MEDIA_WORKERS
+_PARALLEL_MEDIA_MIN = 4
+_MAX_MEDIA_WORKERS = 8
+# 记住的已提取xlsx媒体文件数量上限（超出时先淘汰最久未使用的）
+_XLSX_IMAGE_CACHE_SIZE = 256
+
+# 图片文件头 -> 扩展名，无法识别时再交给PIL解码
+_IMAGE_MAGIC = (
+    (b'\x89PNG\r\n\x1a\n', 'png'),
+    (b'\xff\xd8\xff', 'jpg'),
+    (b'GIF87a', 'gif'),
+    (b'GIF89a', 'gif'),
+    (b'BM', 'bmp'),
+)
+
+
+def _image_format_from_magic(head: bytes) -> Optional[str]:
+    """根据前16个字节识别常见图片格式，无法识别时返回None"""
+    for magic, ext in _IMAGE_MAGIC:
+        if head.startswith(magic):
+            return ext
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'webp'
+    return None
+
+
+def _block_text(block: Dict) -> str:
+    """一次拼接PyMuPDF文本块中各span去除首尾空白后的文本，跳过空span"""
+    return " ".join(
+        text
+        for line in block.get("lines", ())
+        for span in line.get("spans", ())
+        if (text := span.get("text", "").strip())
+    )
+
+
+def _sendfile_stored_member(zip_file, info, dst) -> bool:
+    """用os.sendfile把未压缩（ZIP_STORED）的zip成员直接复制到dst，数据不经过Python；
+    成员或平台不支持时返回False"""
+    if info.compress_type != zipfile.ZIP_STORED or info.flag_bits & 0x1 or not hasattr(os, "sendfile"):
+        return False
+    try:
+        src_fd = zip_file.fp.fileno()
+        dst_fd = dst.fileno()
+        # 数据位于30字节的本地文件头及其文件名、扩展字段之后
+        header = os.pread(src_fd, 30, info.header_offset)
+        if len(header) != 30 or header[:4] != b'PK\x03\x04':
+            return False
+        name_len, extra_len = struct.unpack('<HH', header[26:30])
+        offset = info.header_offset + 30 + name_len + extra_len
+        remaining = info.file_size
+        while remaining:
+            sent = os.sendfile(dst_fd, src_fd, offset, remaining)
+            if not sent:
+                raise OSError("unexpected end of zip member")
+            offset += sent
+            remaining -= sent
+        return True
+    except (AttributeError, OSError, ValueError):
+        # 例如macOS只支持发送到socket；撤销已复制的部分，由调用方按流复制
+        dst.seek(0)
+        dst.truncate()
+        return False
+
+
+def _xls_has_pictures(file_path: str) -> bool:
+    """
+    只遍历记录头，低成本判断BIFF8格式的.xls是否包含图片
+    
+    嵌入图片位于MSODRAWINGGROUP记录（0x00EB，后接CONTINUE 0x003C）的OfficeArt blip存储中，
+    旧式位图位于IMDATA记录（0x007F）中。无法按此方式读取文件时返回True
+    """
+    from xlrd.compdoc import CompDoc
+    try:
+        with open(file_path, 'rb') as f:
+            doc = CompDoc(f.read(), logfile=io.StringIO())
+        stream = doc.get_named_stream('Workbook') or doc.get_named_stream('Book')
+    except Exception:
+        return True
+    if not stream:
+        return True
+    
+    drawing_group = None
+    in_drawing_group = False
+    pos, end = 0, len(stream) - 4
+    while pos <= end:
+        rec_type, length = struct.unpack_from('<HH', stream, pos)
+        if rec_type == 0x007F:
+            return True
+        if rec_type == 0x00EB and drawing_group is None:
+            drawing_group = bytearray(stream[pos + 4:pos + 4 + length])
+            in_drawing_group = True
+        elif rec_type == 0x003C and in_drawing_group:
+            drawing_group += stream[pos + 4:pos + 4 + length]
+        else:
+            in_drawing_group = False
+        pos += 4 + length
+    if drawing_group is None:
+        return False
+    
+    # OfficeArtDggContainer（0xF000）：查找非空的OfficeArtBStoreContainer（0xF001）子记录，
+    # 其instance字段为其中的blip数量
+    if len(drawing_group) < 8:
+        return False
+    _, container_type, container_len = struct.unpack_from('<HHI', drawing_group, 0)
+    if container_type != 0xF000:
+        return True
+    pos, end = 8, min(len(drawing_group), 8 + container_len) - 8
+    while pos <= end:
+        ver_inst, child_type, child_len = struct.unpack_from('<HHI', drawing_group, pos)
+        if child_type == 0xF001:
+            return (ver_inst >> 4) > 0
+        pos += 8 + child_len
+    return False
+
+
+def _group_rows(ys: List[float], y_tolerance: float) -> List[Tuple[int, int]]:
+    """在相邻值相差不小于y_tolerance处把升序的y坐标分成多行，返回每行的(start, end)切片范围"""
+    starts = [0]
+    starts.extend(i for i, (prev, cur) in enumerate(zip(ys, ys[1:]), 1) if cur - prev >= y_tolerance)
+    return list(zip(starts, starts[1:] + [len(ys)]))
+
+
+@lru_cache(maxsize=None)
+def _row_template(ncols: int) -> str:
+    """包含ncols个占位符的Markdown表格行格式字符串，例如'| {} | {} |'"""
+    return "| " + " | ".join(["{}"] * ncols) + " |"
+
+
+@lru_cache(maxsize=256)
+def _is_date_number_format(number_format: str) -> bool:
+    """Excel数字格式是否像日期/时间（一个工作表只用到少数几种格式，结果按格式缓存）"""
+    fmt = number_format.lower()
+    return any(token in fmt for token in ("yy", "dd", "mm", "hh", "ss"))
+
+
+# 文档正文子元素的WordprocessingML限定标签名
+_W_NS = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+_TBL_TAG = _W_NS + 'tbl'
+_P_TAG = _W_NS + 'p'
+
+# 用于在run中定位内嵌图片的DrawingML图片标签
+_PIC_BLIPFILL_TAG = '{http://schemas.openxmlformats.org/drawingml/2006/picture}blipFill'
+_BLIP_TAG = '{http://schemas.openxmlformats.org/drawingml/2006/main}blip'
+_EMBED_ATTR = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}embed'
+
 
 class EnhancedDocumentParser:
     """Enhanced document parser"""
@@ -82,8 +243,22 @@ class EnhancedDocumentParser:
         # Supported image formats
         self.supported_image_formats = {'.png', '.jpg', '.jpeg', '.gif', '.bmp', '.webp'}
         
-        # Temporary variable to store table block indices
-        self._last_table_block_indices = []
+        # 每个PDF页面的page.get_text("dict")结果，页面对象释放时随之丢弃
+        self._page_dicts = weakref.WeakKeyDictionary()
+        
+        # 已写入image_save_dir的XLSX媒体文件，键为(工作簿路径, mtime_ns, 大小, 成员名, CRC32)，
+        # 只在同一个未修改的工作簿中复用
+        self._xlsx_image_cache: "OrderedDict[Tuple[str, int, int, str, int], str]" = OrderedDict()
+        self._xlsx_image_cache_lock = threading.Lock()
+        
+        # 可直接解析的格式对应的解析方法（.doc需要先转换）
+        self._handlers = {
+            '.docx': self._parse_docx,
+            '.pdf': self._parse_pdf,
+            '.xlsx': self._parse_xlsx,
+            '.xls': self._parse_xls,
+            '.pptx': self._parse_pptx,
+        }
         
         # Initialize doc converter
         self.doc_converter = None
@@ -94,7 +269,18 @@ class EnhancedDocumentParser:
             except Exception as e:
                 logger.warning(f"DOC converter initialization failed: {str(e)}")
                 logger.warning("Will be unable to process .doc format files")
-        
+
+    def close(self):
+        """结束DOC转换器的LibreOffice常驻进程并删除其配置目录"""
+        if self.doc_converter is not None:
+            self.doc_converter.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
     def parse_document(self, file_path: str, cleanup_temp: bool = True) -> Dict:
         """
         Parse document (supports docx, pdf, xlsx, xls, pptx, doc)
@@ -109,25 +295,20 @@ class EnhancedDocumentParser:
         temp_docx_path = None
         try:
             file_path = Path(file_path)
-            if not file_path.exists():
+            try:
+                file_size = file_path.stat().st_size
+            except FileNotFoundError:
                 raise FileNotFoundError(f"File does not exist: {file_path}")
             
             file_ext = file_path.suffix.lower()
-            file_size = file_path.stat().st_size
             
             logger.info(f"Starting to parse file: {file_path.name} ({file_size} bytes)")
             
-            if file_ext == '.docx':
-                return self._parse_docx(str(file_path))
-            elif file_ext == '.pdf':
-                return self._parse_pdf(str(file_path))
-            elif file_ext == '.xlsx':
-                return self._parse_xlsx(str(file_path))
-            elif file_ext == '.xls':
-                return self._parse_xls(str(file_path))
-            elif file_ext == '.pptx':
-                return self._parse_pptx(str(file_path))
-            elif file_ext == '.doc':
+            handler = self._handlers.get(file_ext)
+            if handler is not None:
+                return handler(str(file_path))
+            
+            if file_ext == '.doc':
                 # Use LibreOffice to convert .doc to .docx
                 if not self.enable_doc_conversion or self.doc_converter is None:
                     raise ValueError("DOC conversion feature is not enabled or LibreOffice is not installed. Please install LibreOffice or convert the file to .docx format.")
@@ -178,25 +359,41 @@ class EnhancedDocumentParser:
                     if os.path.exists(temp_docx_path):
                         os.remove(temp_docx_path)
                         logger.info(f"Temporary file cleaned up: {temp_docx_path}")
+                    # 删除本次转换单独创建的临时目录（已为空时）
+                    try:
+                        os.rmdir(os.path.dirname(temp_docx_path))
+                    except OSError:
+                        pass
                 except Exception as e:
                     logger.warning(f"Failed to clean up temporary file: {str(e)}")
     
     def _parse_docx(self, file_path: str) -> Dict:
         """Parse docx file"""
         try:
+            import docx
+            from docx.enum.text import WD_PARAGRAPH_ALIGNMENT
+            center_alignment = WD_PARAGRAPH_ALIGNMENT.CENTER
+            
             # Open docx file using the correct method
             doc = docx.Document(file_path)
             markdown_content = []
             images_info = []
             
+            # doc.paragraphs / doc.tables每次访问都会重新构建代理对象列表，只获取一次
+            paragraphs = doc.paragraphs
+            tables = doc.tables
+            
             # Document statistics
-            total_paragraphs = len(doc.paragraphs)
-            total_tables = len(doc.tables)
+            total_paragraphs = len(paragraphs)
+            total_tables = len(tables)
             
             logger.info(f"DOCX document contains {total_paragraphs} paragraphs and {total_tables} tables")
             
-            # Collect all paragraph text for header/footer detection
-            all_paragraphs_text = [p.text.strip() for p in doc.paragraphs if p.text.strip()]
+            # 统计一次各段落文本的出现次数，用于页眉页脚检测（重复出现的短文本）
+            paragraph_counts = Counter(text for text in (p.text.strip() for p in paragraphs) if text)
+            
+            # 正文元素到Paragraph对象的映射，O(1)查找
+            para_by_elem = {p._element: p for p in paragraphs}
             
             # First extract all images, build mapping from rId to image info
             images_info = []
@@ -205,6 +402,7 @@ class EnhancedDocumentParser:
                 logger.info(f"Extracted {len(images_info)} images from DOCX")
             except Exception as e:
                 logger.warning(f"Error extracting DOCX images: {str(e)}")
+            images_by_rel_id = {img_info['rel_id']: img_info for img_info in images_info}
             
             # Create table index for insertion at original position
             table_index = 0
@@ -213,10 +411,11 @@ class EnhancedDocumentParser:
             # Traverse all elements in the document's original order (paragraphs and tables)
             for element in doc.element.body:
                 # Process tables
-                if element.tag.endswith('tbl'):
+                tag = element.tag
+                if tag == _TBL_TAG:
                     # Find corresponding Table object
-                    if table_index < len(doc.tables):
-                        table = doc.tables[table_index]
+                    if table_index < total_tables:
+                        table = tables[table_index]
                         if table_index not in processed_tables:
                             try:
                                 table_md = self._convert_docx_table_to_markdown(table)
@@ -231,30 +430,30 @@ class EnhancedDocumentParser:
                         table_index += 1
                 
                 # Process paragraphs
-                elif element.tag.endswith('p'):
+                elif tag == _P_TAG:
                     # Find corresponding Paragraph object
-                    for paragraph in doc.paragraphs:
-                        if paragraph._element == element:
-                            try:
-                                # Filter headers and footers
-                                if self.filter_headers_footers and self._is_header_or_footer(paragraph, all_paragraphs_text):
-                                    logger.debug(f"Filtering header/footer content: {paragraph.text[:50] if paragraph.text else ''}")
-                                    break
-                                
-                                # Process paragraph text
-                                markdown_lines = self._process_docx_paragraph(paragraph)
-                                markdown_content.extend(markdown_lines)
-                                
-                                # Check if paragraph contains images, if so insert inline
-                                paragraph_images = self._get_paragraph_images(paragraph, images_info)
-                                if paragraph_images:
-                                    for img_info in paragraph_images:
-                                        markdown_content.append(f"![Image]({img_info['url']})")
-                                        markdown_content.append("")
-                                
-                            except Exception as e:
-                                logger.warning(f"Error processing paragraph: {str(e)}")
-                            break
+                    paragraph = para_by_elem.get(element)
+                    if paragraph is not None:
+                        try:
+                            # Filter headers and footers
+                            if self.filter_headers_footers and self._is_header_or_footer(paragraph, paragraph_counts):
+                                if logger.isEnabledFor(logging.DEBUG):
+                                    logger.debug("Filtering header/footer content: %s", paragraph.text[:50])
+                                continue
+                            
+                            # Process paragraph text
+                            markdown_lines = self._process_docx_paragraph(paragraph, center_alignment)
+                            markdown_content.extend(markdown_lines)
+                            
+                            # Check if paragraph contains images, if so insert inline
+                            paragraph_images = self._get_paragraph_images(paragraph, images_by_rel_id)
+                            if paragraph_images:
+                                for img_info in paragraph_images:
+                                    markdown_content.append(f"![Image]({img_info['url']})")
+                                    markdown_content.append("")
+                            
+                        except Exception as e:
+                            logger.warning(f"Error processing paragraph: {str(e)}")
             
             # Clean and format markdown
             result_markdown = self._clean_markdown(markdown_content)
@@ -282,11 +481,12 @@ class EnhancedDocumentParser:
             logger.error(f"DOCX parsing failed: {str(e)}")
             raise
     
-    def _is_header_or_footer(self, paragraph, all_paragraphs_text: List[str]) -> bool:
+    def _is_header_or_footer(self, paragraph, paragraph_counts: Dict[str, int]) -> bool:
         """检测段落是否为页眉或页脚"""
         text = paragraph.text.strip()
         
-        if not text:
+        # 检查按开销从低到高排列；较长的正文段落不可能匹配其中任何一项
+        if not text or len(text) >= 150:
             return False
         
         # 1. 检测纯数字(页码)
@@ -294,36 +494,25 @@ class EnhancedDocumentParser:
             return True
         
         # 2. 检测常见页码格式
-        page_patterns = [
-            r'^第\s*\d+\s*页$',  # 第X页
-            r'^-\s*\d+\s*-$',     # -X-
-            r'^\d+\s*/\s*\d+$',  # X/Y
-            r'^Page\s+\d+$',     # Page X
-            r'^\d+\s+of\s+\d+$', # X of Y
-        ]
-        for pattern in page_patterns:
-            if re.match(pattern, text, re.IGNORECASE):
-                return True
+        if _PAGE_NUMBER_RE.match(text):
+            return True
         
-        # 3. Detect repeated short text (possibly header)
-        # If same text appears more than 3 times in document and is relatively short, likely a header
+        # 3. 检测常见页眉页脚关键词
+        if _FOOTER_KEYWORDS_RE.search(text):
+            return True
+        
+        # 4. 检测重复出现的短文本（可能是页眉）
+        # 相同文本在文档中出现超过3次且较短时，很可能是页眉
         if len(text) < 100:
-            count = all_paragraphs_text.count(text)
+            count = paragraph_counts.get(text, 0)
             if count > 3:
-                logger.debug(f"Detected repeated text (appears {count} times): {text[:30]}")
+                logger.debug("Detected repeated text (appears %d times): %s", count, text[:30])
                 return True
         
-        # 4. Detect common header/footer keywords
-        footer_keywords = ['\u7248\u6743\u6240\u6709', '\u4fdd\u7559\u6240\u6709\u6743\u5229', 'all rights reserved', 'copyright', 
-                          '\u673a\u5bc6', 'confidential', '\u5185\u90e8\u8d44\u6599']
-        text_lower = text.lower()
-        if any(keyword in text_lower for keyword in footer_keywords) and len(text) < 150:
-            return True
-        
         return False
     
-    def _process_docx_paragraph(self, paragraph) -> List[str]:
-        """处理DOCX段落，返回markdown行"""
+    def _process_docx_paragraph(self, paragraph, center_alignment) -> List[str]:
+        """处理DOCX段落，返回markdown行（center_alignment为居中对齐的枚举值，由_parse_docx导入一次后传入）"""
         lines = []
         text = paragraph.text.strip()
         
@@ -343,8 +532,7 @@ class EnhancedDocumentParser:
             lines.append("")
         else:
             # 检查段落对齐方式
-            alignment = paragraph.alignment
-            if alignment == WD_PARAGRAPH_ALIGNMENT.CENTER:
+            if paragraph.alignment == center_alignment:
                 # 居中文本处理：判断是否像标题
                 # 如果文本较短(少于50字符)且不包含句号，可能是标题
                 if len(text) < 50 and '。' not in text and '.' not in text:
@@ -355,20 +543,9 @@ class EnhancedDocumentParser:
                     lines.append(f"**{text}**")
             else:
                 # 处理列表项（简单检测）
-                if re.match(r'^\s*[\d\w]+[.)]\s+', text) or text.strip().startswith(('•', '-', '*')):
-                    # 有序或无序列表
-                    if re.match(r'^\s*\d+[.)]\s+', text):
-                        # 有序列表
-                        match = re.match(r'^\s*\d+[.)]\s+(.+)', text)
-                        if match:
-                            lines.append(f"1. {match.group(1)}")
-                    else:
-                        # 无序列表
-                        cleaned_text = re.sub(r'^\s*[•\-*]\s+', '', text)
-                        lines.append(f"- {cleaned_text}")
-                else:
-                    # 普通段落
-                    lines.append(text)
+                list_item = self._list_item_to_markdown(text)
+                # 列表项或普通段落
+                lines.append(list_item if list_item is not None else text)
             
             lines.append("")
         
@@ -377,57 +554,26 @@ class EnhancedDocumentParser:
     def _parse_pdf(self, file_path: str) -> Dict:
         """Parse pdf file"""
         try:
+            import fitz  # PyMuPDF
+            
             doc = fitz.open(file_path)
             markdown_content = []
             images_info = []
             
+            # xref -> 已保存的图片信息（跳过的图片为None），各页共享，
+            # 重复出现的图片（如logo）只提取和写入一次
+            seen_xrefs: Dict[int, Optional[Dict]] = {}
+            
             total_pages = len(doc)
             logger.info(f"PDF document has {total_pages} pages")
             
+            # 逐页顺序处理：PyMuPDF不是线程安全的且持有GIL，
+            # 对同一文档的页面使用线程池既不安全也不会更快
             for page_num in range(total_pages):
                 try:
-                    page = doc.load_page(page_num)
-                    
-                    # Get page text blocks dictionary in one call (cached to avoid repeated calls)
-                    page_dict = page.get_text("dict")
-                    
-                    # Extract tables and get table position information
-                    self._last_table_block_indices = []  # Reset
-                    tables = self._extract_pdf_tables_optimized(page, page_num, page_dict)
-                    
-                    # Extract images
-                    page_images = self._extract_pdf_images(page, page_num)
-                    if page_images:
-                        images_info.extend(page_images)
-                    
-                    # Mix output content in position order (using cached page_dict)
-                    if tables:
-                        # Get all content blocks and their positions
-                        content_blocks = self._get_ordered_content_blocks_optimized(page_dict, tables, page_images)
-                        
-                        # Output in order
-                        for block in content_blocks:
-                            if block['type'] == 'text':
-                                markdown_content.append(block['content'])
-                                markdown_content.append("")
-                            elif block['type'] == 'table':
-                                markdown_content.extend(block['content'])
-                                markdown_content.append("")
-                            elif block['type'] == 'image':
-                                markdown_content.append(block['content'])
-                                markdown_content.append("")
-                    else:
-                        # When there are no tables, output text and images in normal order
-                        text = page.get_text()
-                        if text.strip():
-                            processed_text = self._process_pdf_text(text)
-                            markdown_content.extend(processed_text)
-                        
-                        # Output images
-                        for img_info in page_images:
-                            markdown_content.append(f"![Image]({img_info['url']})")
-                            markdown_content.append("")
-                    
+                    page_lines, page_images = self._parse_pdf_page(doc, page_num, seen_xrefs)
+                    markdown_content.extend(page_lines)
+                    images_info.extend(page_images)
                 except Exception as e:
                     logger.warning(f"Error processing PDF page {page_num + 1}: {str(e)}")
                     continue
@@ -459,6 +605,67 @@ class EnhancedDocumentParser:
             logger.error(f"PDF parsing failed: {str(e)}")
             raise
     
+    def _parse_pdf_page(self, doc, page_num: int, seen_xrefs: Dict[int, Optional[Dict]]) -> Tuple[List[str], List[Dict]]:
+        """解析单个PDF页面，返回(markdown行, 图片列表)"""
+        markdown_content = []
+        page = doc.load_page(page_num)
+        
+        # Get page text blocks dictionary in one call (cached to avoid repeated calls)
+        page_dict = self._get_page_dict(page)
+        
+        # Extract tables and get table position information
+        tables, table_block_indices = self._extract_pdf_tables_optimized(page, page_num, page_dict)
+        
+        # Extract images
+        page_images = self._extract_pdf_images(page, page_num, seen_xrefs)
+        
+        # Mix output content in position order (using cached page_dict)
+        if tables:
+            # Get all content blocks and their positions
+            content_blocks = self._get_ordered_content_blocks_optimized(page_dict, tables, page_images,
+                                                                        table_block_indices)
+            
+            # Output in order
+            for block in content_blocks:
+                if block['type'] == 'text':
+                    markdown_content.append(block['content'])
+                    markdown_content.append("")
+                elif block['type'] == 'table':
+                    markdown_content.extend(block['content'])
+                    markdown_content.append("")
+                elif block['type'] == 'image':
+                    markdown_content.append(block['content'])
+                    markdown_content.append("")
+        else:
+            # 没有表格时按正常顺序输出文本和图片
+            # （由缓存的page_dict重建文本，不再让MuPDF提取第二遍）
+            text = self._plain_text_from_dict(page_dict)
+            if text.strip():
+                processed_text = self._process_pdf_text(text)
+                markdown_content.extend(processed_text)
+            
+            # Output images
+            for img_info in page_images:
+                markdown_content.append(f"![Image]({img_info['url']})")
+                markdown_content.append("")
+        
+        return markdown_content, page_images
+    
+    def _list_item_to_markdown(self, text: str) -> Optional[str]:
+        """把以列表标记开头的文本转换为markdown列表项，不是列表项时返回None"""
+        match = _LIST_ITEM_RE.match(text)
+        if match:
+            if match.group('ordered') is not None:
+                # 有序列表
+                return f"1. {match.group('ordered')}"
+            if match.group('bullet') is not None:
+                # 无序列表，去掉原有的项目符号
+                return f"- {text[match.end():]}"
+            return f"- {text}"
+        if text.startswith(('•', '-', '*')):
+            return f"- {text}"
+        return None
+    
     def _process_pdf_text(self, text: str) -> List[str]:
         """处理PDF文本，改进格式识别"""
         lines = []
@@ -472,53 +679,40 @@ class EnhancedDocumentParser:
                 continue
             
             # 清理多余的换行符，但保留必要的分段
-            para = re.sub(r'\n+', ' ', para)
-            para = re.sub(r'\s+', ' ', para)
+            para = _MULTINL_RE.sub(' ', para)
+            para = _WS_RE.sub(' ', para)
             
             # 检测标题（大写字母开头，相对较短）
             if (len(para) < 100 and 
                 (para.isupper() or 
-                 re.match(r'^[A-Z][^.!?]*$', para) or
-                 re.match(r'^\d+[\.\s]+[A-Z]', para))):
+                 _CAPITALIZED_TITLE_RE.match(para) or
+                 _NUMBERED_TITLE_RE.match(para))):
                 lines.append(f"## {para}")
                 lines.append("")
             else:
                 # 检测列表项
-                if re.match(r'^\s*[\d\w]+[.)]\s+', para) or para.startswith(('•', '-', '*')):
-                    if re.match(r'^\s*\d+[.)]\s+', para):
-                        match = re.match(r'^\s*\d+[.)]\s+(.+)', para)
-                        if match:
-                            lines.append(f"1. {match.group(1)}")
-                    else:
-                        cleaned_text = re.sub(r'^\s*[•\-*]\s+', '', para)
-                        lines.append(f"- {cleaned_text}")
-                else:
-                    lines.append(para)
+                list_item = self._list_item_to_markdown(para)
+                lines.append(list_item if list_item is not None else para)
                 
                 lines.append("")
         
         return lines
     
-    def _get_paragraph_images(self, paragraph, all_images: List[Dict]) -> List[Dict]:
-        """获取段落中包含的图片"""
+    def _get_paragraph_images(self, paragraph, images_by_rel_id: Dict[str, Dict]) -> List[Dict]:
+        """获取段落中包含的图片（images_by_rel_id: 关系ID -> 图片信息）"""
         paragraph_images = []
         
         try:
-            # 检查段落的runs中是否有图片
+            # 直接遍历runs的XML树查找图片引用，不把元素序列化为字符串
             for run in paragraph.runs:
-                # 检查run中是否包含图片元素
-                if 'graphic' in run._element.xml:
-                    # 提取图片的关系ID
-                    for inline in run._element.findall('.//{http://schemas.openxmlformats.org/wordprocessingml/2006/main}drawing//{http://schemas.openxmlformats.org/drawingml/2006/picture}blipFill//{http://schemas.openxmlformats.org/drawingml/2006/main}blip'):
-                        embed = inline.get('{http://schemas.openxmlformats.org/officeDocument/2006/relationships}embed')
-                        if embed:
-                            # 查找对应的图片信息
-                            for img_info in all_images:
-                                if img_info.get('rel_id') == embed:
-                                    paragraph_images.append(img_info)
-                                    break
+                for blip in run._element.iter(_BLIP_TAG):
+                    if blip.getparent().tag != _PIC_BLIPFILL_TAG:
+                        continue
+                    embed = blip.get(_EMBED_ATTR)
+                    if embed and embed in images_by_rel_id:
+                        paragraph_images.append(images_by_rel_id[embed])
         except Exception as e:
-            logger.debug(f"获取段落图片时出错: {str(e)}")
+            logger.debug("获取段落图片时出错: %s", e)
         
         return paragraph_images
     
@@ -526,43 +720,47 @@ class EnhancedDocumentParser:
         """从docx文档中提取图片"""
         images_info = []
         
+        # 循环中用到的属性提前绑定到局部变量
+        save_dir = self.image_save_dir
+        url_prefix = f"{self.image_base_url}/static/images/"
+        append_image = images_info.append
+        
         try:
             # 遍历文档中的所有关系，查找图片
             for rel_id, rel in doc.part.rels.items():
                 if "image" in rel.target_ref:
                     try:
                         # 获取图片数据
-                        image_data = rel.target_part.blob
+                        target_part = rel.target_part
+                        image_data = target_part.blob
                         
                         if len(image_data) < 100:  # 跳过太小的图片
                             continue
                         
+                        # 在内存中识别格式并验证，无效图片不写入磁盘
+                        image_ext = self._detect_image_format(image_data)
+                        if image_ext is None:
+                            continue
+                        
                         # 生成唯一文件名
                         image_id = str(uuid.uuid4())
-                        image_ext = self._get_image_extension(image_data)
                         image_filename = f"{image_id}.{image_ext}"
-                        image_path = self.image_save_dir / image_filename
+                        image_path = save_dir / image_filename
                         
                         # 保存图片
-                        with open(image_path, 'wb') as f:
-                            f.write(image_data)
+                        image_path.write_bytes(image_data)
                         
-                        # 验证图片是否有效
-                        if self._validate_image(image_path):
-                            # 生成访问URL
-                            image_url = f"{self.image_base_url}/static/images/{image_filename}"
-                            
-                            images_info.append({
-                                "filename": image_filename,
-                                "path": str(image_path),
-                                "url": image_url,
-                                "size": len(image_data),
-                                "format": image_ext,
-                                "rel_id": rel_id  # 保存关系ID用于定位
-                            })
-                        else:
-                            # 删除无效图片
-                            os.remove(image_path)
+                        # 生成访问URL
+                        image_url = url_prefix + image_filename
+                        
+                        append_image({
+                            "filename": image_filename,
+                            "path": str(image_path),
+                            "url": image_url,
+                            "size": len(image_data),
+                            "format": image_ext,
+                            "rel_id": rel_id  # 保存关系ID用于定位
+                        })
                             
                     except Exception as e:
                         logger.warning(f"处理DOCX图片{rel_id}时出错: {str(e)}")
@@ -574,53 +772,76 @@ class EnhancedDocumentParser:
         logger.info(f"从DOCX提取了{len(images_info)}张有效图片")
         return images_info
     
-    def _extract_pdf_images(self, page, page_num: int) -> List[Dict]:
-        """从pdf页面中提取图片"""
+    def _extract_pdf_images(self, page, page_num: int,
+                            seen_xrefs: Optional[Dict[int, Optional[Dict]]] = None) -> List[Dict]:
+        """从pdf页面中提取图片，seen_xrefs记录已处理过的图片，重复出现时复用已保存的文件"""
+        if seen_xrefs is None:
+            seen_xrefs = {}
         images_info = []
         
+        # 循环中用到的属性提前绑定到局部变量
+        save_dir = self.image_save_dir
+        url_prefix = f"{self.image_base_url}/static/images/"
+        
         try:
             image_list = page.get_images()
-            logger.debug(f"PDF第{page_num + 1}页发现{len(image_list)}个图片对象")
+            logger.debug("PDF第%d页发现%d个图片对象", page_num + 1, len(image_list))
             
             for img_index, img in enumerate(image_list):
                 try:
-                    # 获取图片对象
+                    # 直接读取PDF中存储的图片数据，JPEG/PNG无需解码再重新编码
                     xref = img[0]
-                    pix = fitz.Pixmap(page.parent, xref)
+                    if xref in seen_xrefs:
+                        if seen_xrefs[xref] is not None:
+                            images_info.append({**seen_xrefs[xref], "page": page_num + 1, "index": img_index})
+                        continue
+                    seen_xrefs[xref] = None
+                    
+                    info = page.parent.extract_image(xref)
+                    if not info:
+                        continue
+                    width = info.get("width", 0)
+                    height = info.get("height", 0)
                     
                     # 跳过CMYK图片和太小的图片
-                    if pix.n - pix.alpha >= 4 or pix.width < 50 or pix.height < 50:
-                        pix = None
+                    if info.get("colorspace", 0) >= 4 or width < 50 or height < 50:
                         continue
                     
+                    image_data = info.get("image", b"")
+                    image_ext = None
+                    if info.get("ext") in ("png", "jpeg"):
+                        image_ext = _image_format_from_magic(image_data[:16])
+                    if image_ext is None:
+                        # 其他编码（JPX、JBIG2等）浏览器无法直接显示，解码后转为PNG
+                        import fitz
+                        pix = fitz.Pixmap(page.parent, xref)
+                        image_data = pix.tobytes("png")
+                        image_ext = "png"
+                        pix = None  # 释放内存
+                    
                     # 生成唯一文件名
                     image_id = str(uuid.uuid4())
-                    image_filename = f"{image_id}.png"
-                    image_path = self.image_save_dir / image_filename
+                    image_filename = f"{image_id}.{image_ext}"
+                    image_path = save_dir / image_filename
                     
                     # 保存图片
-                    pix.save(str(image_path))
+                    image_path.write_bytes(image_data)
                     
-                    # 验证图片是否有效
-                    if self._validate_image(image_path):
-                        # 生成访问URL
-                        image_url = f"{self.image_base_url}/static/images/{image_filename}"
-                        
-                        images_info.append({
-                            "filename": image_filename,
-                            "path": str(image_path),
-                            "url": image_url,
-                            "page": page_num + 1,
-                            "index": img_index,
-                            "width": pix.width,
-                            "height": pix.height,
-                            "format": "png"
-                        })
-                    else:
-                        # 删除无效图片
-                        os.remove(image_path)
+                    # 生成访问URL
+                    image_url = url_prefix + image_filename
                     
-                    pix = None  # 释放内存
+                    image_info = {
+                        "filename": image_filename,
+                        "path": str(image_path),
+                        "url": image_url,
+                        "page": page_num + 1,
+                        "index": img_index,
+                        "width": width,
+                        "height": height,
+                        "format": image_ext
+                    }
+                    seen_xrefs[xref] = image_info
+                    images_info.append(image_info)
                     
                 except Exception as e:
                     logger.warning(f"处理PDF第{page_num + 1}页图片{img_index}时出错: {str(e)}")
@@ -629,12 +850,18 @@ class EnhancedDocumentParser:
         except Exception as e:
             logger.warning(f"PDF第{page_num + 1}页图片提取失败: {str(e)}")
         
-        logger.debug(f"从PDF第{page_num + 1}页提取了{len(images_info)}张有效图片")
+        logger.debug("从PDF第%d页提取了%d张有效图片", page_num + 1, len(images_info))
         return images_info
     
-    def _extract_pdf_tables_optimized(self, page, page_num: int, page_dict: Dict = None) -> List[Dict]:
-        """从PDF页面提取表格，返回表格信息列表（包含内容和位置） - 性能优化版"""
+    def _extract_pdf_tables_optimized(self, page, page_num: int, page_dict: Dict = None) -> Tuple[List[Dict], FrozenSet[int]]:
+        """
+        从PDF页面提取表格 - 性能优化版
+        
+        Returns:
+            (表格信息列表（包含内容和位置）, 文本检测表格所占的文本块索引)
+        """
         tables = []
+        table_block_indices = frozenset()
         table_count = 0
         
         try:
@@ -667,99 +894,98 @@ class EnhancedDocumentParser:
             # 方法2: 如果没找到标准表格,尝试基于文本位置检测表格
             # 优化: 传入已缓存的page_dict，避免重复调用get_text("dict")
             if table_count == 0:
-                logger.debug(f"PDF第{page_num + 1}页未找到标准表格,尝试文本位置检测...")
+                logger.debug("PDF第%d页未找到标准表格,尝试文本位置检测...", page_num + 1)
                 if page_dict is None:
-                    page_dict = page.get_text("dict")
-                detected_tables = self._detect_tables_from_text_optimized(page_dict, page_num)
+                    page_dict = self._get_page_dict(page)
+                detected_tables, table_block_indices = self._detect_tables_from_text_optimized(page_dict, page_num)
                 for detected_table in detected_tables:
                     # detected_table已经是markdown内容列表，需要包装成字典
                     tables.append({
                         'content': detected_table,
                         'bbox': None,
-                        'y_pos': 0,  # 文本检测的表格位置已通过_last_table_block_indices处理
+                        'y_pos': 0,  # 文本检测的表格位置通过table_block_indices处理
                         'type': 'detected'  # 检测到的表格
                     })
                     table_count += 1
                     
         except Exception as e:
-            logger.debug(f"PDF第{page_num + 1}页表格提取失败: {str(e)}")
+            logger.debug("PDF第%d页表格提取失败: %s", page_num + 1, e)
         
-        return tables
+        return tables, table_block_indices
     
     # 保留旧方法以向后兼容
     def _extract_pdf_tables(self, page, page_num: int) -> List[Dict]:
         """从PDF页面提取表格（兼容旧版本，内部调用优化版）"""
-        return self._extract_pdf_tables_optimized(page, page_num, None)
+        return self._extract_pdf_tables_optimized(page, page_num, None)[0]
     
-    def _detect_tables_from_text_optimized(self, page_dict: Dict, page_num: int) -> List[List[str]]:
-        """基于文本位置智能检测表格 - 性能优化版（使用缓存的page_dict）"""
+    def _detect_tables_from_text_optimized(self, page_dict: Dict, page_num: int) -> Tuple[List[List[str]], FrozenSet[int]]:
+        """基于文本位置智能检测表格 - 性能优化版（使用缓存的page_dict），返回(表格列表, 表格所占的文本块索引)"""
         tables = []
-        table_block_indices = []
+        table_block_indices = frozenset()
         
         try:
             # 使用传入的page_dict，避免重复调用
             blocks = page_dict["blocks"]
             
-            # 优化: 使用列表推导式和生成器，减少循环层级
+            # 至少需要3行才能构成表格：先按行数粗判，行数不足的页面无需遍历span
+            # （按行而非文本块计数，单个文本块内也可能包含整张表格）
+            if sum(len(block.get("lines", ())) for block in blocks if block.get("type") == 0) < 3:
+                return tables, table_block_indices
+            
+            # 优化: 内层循环按span数执行，把方法查找提到循环外
             text_blocks = []
+            get = dict.get
+            strip = str.strip
+            join = " ".join
+            append = text_blocks.append
             for block_idx, block in enumerate(blocks):
-                if block.get("type") == 0:  # 文本块
-                    for line in block.get("lines", []):
-                        spans = line.get("spans", [])
-                        if not spans:
-                            continue
-                        text = " ".join(span.get("text", "").strip() for span in spans).strip()
-                        if text:
-                            bbox = line["bbox"]
-                            text_blocks.append({
-                                "text": text,
-                                "x0": bbox[0],
-                                "y0": bbox[1],
-                                "x1": bbox[2],
-                                "y1": bbox[3],
-                                "block_idx": block_idx
-                            })
+                if get(block, "type") != 0:  # 只处理文本块
+                    continue
+                for line in get(block, "lines") or ():
+                    spans = get(line, "spans")
+                    if not spans:
+                        continue
+                    # 大多数行只有一个span，直接取文本，无需拼接
+                    if len(spans) == 1:
+                        text = strip(get(spans[0], "text", ""))
+                    else:
+                        text = strip(join([strip(get(span, "text", "")) for span in spans]))
+                    if text:
+                        x0, y0, x1, y1 = line["bbox"]
+                        append({
+                            "text": text,
+                            "x0": x0,
+                            "y0": y0,
+                            "x1": x1,
+                            "y1": y1,
+                            "block_idx": block_idx
+                        })
             
             if len(text_blocks) < 3:  # 至少需要3行才能构成表格
-                return tables
+                return tables, table_block_indices
             
             # 按Y坐标排序(从上到下)
-            text_blocks.sort(key=lambda b: b["y0"])
+            text_blocks.sort(key=itemgetter("y0"))
             
-            # 优化: 使用更高效的行分组算法
-            rows = []
-            current_row = []
-            last_y = None
+            # 行分组: 相邻两行Y坐标之差达到容差处即为新行的起点，按起点切片后每行按X坐标排序
             y_tolerance = 5
-            
-            for block in text_blocks:
-                if last_y is None or abs(block["y0"] - last_y) < y_tolerance:
-                    current_row.append(block)
-                    last_y = block["y0"]
-                else:
-                    if current_row:
-                        current_row.sort(key=lambda b: b["x0"])
-                        rows.append(current_row)
-                    current_row = [block]
-                    last_y = block["y0"]
-            
-            if current_row:
-                current_row.sort(key=lambda b: b["x0"])
-                rows.append(current_row)
+            x_key = itemgetter("x0")
+            rows = [sorted(text_blocks[start:end], key=x_key)
+                    for start, end in _group_rows([block["y0"] for block in text_blocks], y_tolerance)]
             
             # 优化: 提前退出条件
             if len(rows) < 2:
-                return tables
+                return tables, table_block_indices
             
             # 统计每行的列数
             col_counts = [len(row) for row in rows]
             if not col_counts:
-                return tables
+                return tables, table_block_indices
             
-            most_common_cols = max(set(col_counts), key=col_counts.count)
+            most_common_cols, mode_count = Counter(col_counts).most_common(1)[0]
             
             # 如果大多数行有相同的列数,认为是表格
-            if col_counts.count(most_common_cols) >= len(rows) * 0.6 and most_common_cols > 1:
+            if mode_count >= len(rows) * 0.6 and most_common_cols > 1:
                 # 构建表格数据并记录块索引
                 table_data = []
                 block_idx_set = set()  # 使用set提升查找性能
@@ -775,20 +1001,20 @@ class EnhancedDocumentParser:
                     markdown_table = self._convert_pdf_table_to_markdown(table_data, page_num, 0)
                     if markdown_table:
                         tables.append(markdown_table)
-                        # 保存表格块索引供后续过滤使用
-                        self._last_table_block_indices = list(block_idx_set)
+                        # 返回表格块索引供后续过滤使用
+                        table_block_indices = frozenset(block_idx_set)
                         logger.info(f"PDF第{page_num + 1}页通过文本位置检测到表格: {len(table_data)}行 x {most_common_cols}列")
                         
         except Exception as e:
             logger.warning(f"PDF第{page_num + 1}页基于文本位置的表格检测失败: {str(e)}")
         
-        return tables
+        return tables, table_block_indices
     
     # 保留旧方法以向后兼容
     def _detect_tables_from_text(self, page, page_num: int) -> List[List[str]]:
         """基于文本位置智能检测表格（兼容旧版本）"""
-        page_dict = page.get_text("dict")
-        return self._detect_tables_from_text_optimized(page_dict, page_num)
+        page_dict = self._get_page_dict(page)
+        return self._detect_tables_from_text_optimized(page_dict, page_num)[0]
     
     def _convert_pdf_table_to_markdown(self, table_data: List[List], page_num: int, table_idx: int) -> List[str]:
         """将PDF表格数据转换为markdown格式"""
@@ -798,60 +1024,48 @@ class EnhancedDocumentParser:
         markdown_table = []
         
         try:
-            # 过滤掉完全为空的行
+            # 一次遍历完成单元格清理、过滤完全为空的行并统计最大列数
             filtered_data = []
+            max_cols = 0
             for row in table_data:
-                # 清理单元格数据
-                cleaned_row = []
-                for cell in row:
-                    if cell is None:
-                        cleaned_row.append("")
-                    else:
-                        # 转换为字符串并清理
-                        cell_str = str(cell).strip().replace('\n', ' ').replace('|', '\\|')
-                        cleaned_row.append(cell_str)
-                
+                cleaned_row = ["" if cell is None else str(cell).strip().translate(_PDF_CELL_TRANS) for cell in row]
                 # 如果行中有任何非空内容，则保留
-                if any(cell for cell in cleaned_row):
+                if any(cleaned_row):
                     filtered_data.append(cleaned_row)
+                    if len(cleaned_row) > max_cols:
+                        max_cols = len(cleaned_row)
             
             if not filtered_data:
                 return []
             
-            # 确保所有行有相同的列数
-            max_cols = max(len(row) for row in filtered_data)
-            normalized_data = []
-            for row in filtered_data:
-                # 补齐列数
-                normalized_row = row + [""] * (max_cols - len(row))
-                normalized_data.append(normalized_row)
-            
             # 添加表格标题
             markdown_table.append(f"\n**表格 {table_idx + 1}** (第{page_num + 1}页):\n")
             
-            # 生成表头
-            if normalized_data:
-                headers = normalized_data[0]
+            # 生成表头（列数不足的行在输出时补齐）
+            if filtered_data:
+                headers = filtered_data[0]
                 # 如果第一行看起来不像表头（全是空或很短的数字），生成默认表头
                 if all(not h or (h.isdigit() and len(h) <= 3) for h in headers):
                     headers = [f"列{i+1}" for i in range(max_cols)]
                     # 不跳过第一行，因为它是数据
-                    data_rows = normalized_data
+                    data_rows = filtered_data
                 else:
                     # 第一行作为表头
-                    data_rows = normalized_data[1:]
+                    data_rows = filtered_data[1:]
                 
                 # 如果表头为空，使用默认列名
+                headers = headers + [""] * (max_cols - len(headers))
                 headers = [h if h else f"列{i+1}" for i, h in enumerate(headers)]
                 
-                markdown_table.append("| " + " | ".join(headers) + " |")
-                markdown_table.append("| " + " | ".join(["---"] * len(headers)) + " |")
+                fmt = _row_template(max_cols)
+                markdown_table.append(fmt.format(*headers))
+                markdown_table.append(fmt.format(*["---"] * max_cols))
                 
-                # 生成数据行
-                for row in data_rows:
-                    # 替换空单元格为"-"以提高可读性
-                    row_display = [cell if cell else "-" for cell in row]
-                    markdown_table.append("| " + " | ".join(row_display) + " |")
+                # 生成数据行，空单元格替换为"-"以提高可读性
+                markdown_table.extend(
+                    fmt.format(*[cell if cell else "-" for cell in row], *["-"] * (max_cols - len(row)))
+                    for row in data_rows
+                )
             
         except Exception as e:
             logger.warning(f"PDF表格转换失败: {str(e)}")
@@ -860,9 +1074,21 @@ class EnhancedDocumentParser:
         return markdown_table
     
     def _validate_image(self, image_path: Path) -> bool:
-        """验证图片是否有效"""
+        """验证图片是否有效（常见格式只检查文件头，其他格式交给PIL校验）"""
+        try:
+            with open(image_path, 'rb') as f:
+                return self._validate_image_stream(f)
+        except OSError:
+            return False
+    
+    def _validate_image_stream(self, stream) -> bool:
+        """验证可seek的二进制流中的图片是否有效，只读取文件头，不解码像素"""
         try:
-            with Image.open(image_path) as img:
+            if _image_format_from_magic(stream.read(16)):
+                return True
+            stream.seek(0)
+            from PIL import Image
+            with Image.open(stream) as img:
                 img.verify()
             return True
         except Exception:
@@ -905,8 +1131,9 @@ class EnhancedDocumentParser:
             # 处理表头
             header_row = rows[0]
             headers = [cell.text.strip() or f"列{i+1}" for i, cell in enumerate(header_row.cells)]
-            markdown_table.append("| " + " | ".join(headers) + " |")
-            markdown_table.append("| " + " | ".join(["---"] * len(headers)) + " |")
+            fmt = _row_template(len(headers))
+            markdown_table.append(fmt.format(*headers))
+            markdown_table.append(fmt.format(*["---"] * len(headers)))
             
             # 处理数据行
             for row in rows[1:]:
@@ -914,7 +1141,9 @@ class EnhancedDocumentParser:
                 for i, cell in enumerate(row.cells):
                     cell_text = cell.text.strip().replace('\n', '<br>')
                     row_data.append(cell_text or "-")
-                markdown_table.append("| " + " | ".join(row_data) + " |")
+                # 合并单元格可能导致各行单元格数不同
+                row_fmt = fmt if len(row_data) == len(headers) else _row_template(len(row_data))
+                markdown_table.append(row_fmt.format(*row_data))
             
         except Exception as e:
             logger.warning(f"表格转换失败: {str(e)}")
@@ -922,44 +1151,68 @@ class EnhancedDocumentParser:
         
         return markdown_table
     
+    def _detect_image_format(self, image_data: bytes) -> Optional[str]:
+        """根据图片数据判断图片格式并验证，无效图片返回None"""
+        image_ext = _image_format_from_magic(image_data[:16])
+        if image_ext:
+            return image_ext
+        try:
+            from PIL import Image
+            with Image.open(io.BytesIO(image_data)) as image:
+                format_name = (image.format or 'png').lower().strip()
+                image.verify()
+            return 'jpg' if format_name == 'jpeg' else format_name
+        except Exception:
+            return None
+    
     def _get_image_extension(self, image_data: bytes) -> str:
-        """根据图片数据判断图片格式"""
+        """根据图片数据判断图片格式（常见格式只比较文件头，其他格式才用PIL读取）"""
+        image_ext = _image_format_from_magic(image_data[:16])
+        if image_ext:
+            return image_ext
         try:
-            image = Image.open(io.BytesIO(image_data))
-            format_name = image.format.lower()
-            if format_name == 'jpeg':
-                return 'jpg'
-            return format_name.strip() if format_name else 'png'
+            from PIL import Image
+            with Image.open(io.BytesIO(image_data)) as image:
+                format_name = (image.format or 'png').lower().strip()
+            return 'jpg' if format_name == 'jpeg' else format_name
         except Exception:
             return 'png'  # 默认png格式
     
     def _clean_markdown(self, markdown_lines: List[str]) -> str:
         """清理和格式化markdown内容"""
-        # 合并所有行
-        content = "\n".join(markdown_lines)
-        
-        # 清理多余的空行（最多保留2个连续空行）
-        content = re.sub(r'\n{3,}', '\n\n', content)
-        
-        # 清理行首行尾空格
-        lines = [line.rstrip() for line in content.split('\n')]
+        # 逐项遍历一次完成清理，不先拼接成整个文档字符串再拆分（单项内可能含换行）：
+        # 连续的空行只保留一个（等价于把3个以上连续换行替换为2个），并清理行尾空格
+        lines = []
+        append = lines.append
+        previous_empty = False
+        for item in markdown_lines:
+            for line in item.split('\n'):
+                if not line:
+                    if previous_empty:
+                        continue
+                    previous_empty = True
+                else:
+                    previous_empty = False
+                append(line.rstrip())
         
         # 移除文档开头和结尾的空行
-        while lines and not lines[0].strip():
-            lines.pop(0)
-        while lines and not lines[-1].strip():
-            lines.pop()
+        start = 0
+        end = len(lines)
+        while start < end and not lines[start].strip():
+            start += 1
+        while end > start and not lines[end - 1].strip():
+            end -= 1
         
-        return '\n'.join(lines)
+        return '\n'.join(lines[start:end])
     
-    def _get_ordered_content_blocks_optimized(self, page_dict: Dict, tables, images) -> List[Dict]:
+    def _get_ordered_content_blocks_optimized(self, page_dict: Dict, tables, images,
+                                              table_block_indices: FrozenSet[int] = frozenset()) -> List[Dict]:
         """获取按位置排序的内容块(文本、表格、图片) - 性能优化版"""
         content_blocks = []
         
         try:
             # 使用传入的page_dict，避免重复调用
             blocks = page_dict["blocks"]
-            image_idx = 0
             
             # 优化: 预先筛选标准表格，避免重复过滤
             standard_tables = [t for t in tables if t.get('type') == 'standard' and t.get('bbox')]
@@ -975,25 +1228,24 @@ class EnhancedDocumentParser:
                     'sort_key': (y_pos, -1)
                 })
             
-            # 优化: 使用集合快速查找
-            table_block_indices_set = set(self._last_table_block_indices)
-            min_table_block_idx = min(self._last_table_block_indices) if self._last_table_block_indices else -1
+            # 标准表格边界框按上边界排序：文本块只可能位于上边界不低于它的表格内，用二分查找截取候选
+            table_bboxes = sorted((t['bbox'] for t in standard_tables), key=itemgetter(1))
+            table_tops = [t_bbox[1] for t_bbox in table_bboxes]
+            
+            min_table_block_idx = min(table_block_indices) if table_block_indices else -1
             
             # 处理文本块和检测到的表格
             for block_idx, block in enumerate(blocks):
-                block_type = block.get("type")
-                
-                if block_type == 0:  # 文本块
+                if block.get("type") == 0:  # 文本块
                     bbox = block.get("bbox", [0, 0, 0, 0])
                     y_pos = bbox[1]
                     
                     # 优化: 只在有标准表格时才检查重叠
                     is_in_table = False
-                    if standard_tables:
-                        for table_info in standard_tables:
-                            t_bbox = table_info['bbox']
+                    if table_bboxes:
+                        for t_bbox in table_bboxes[:bisect_right(table_tops, bbox[1] + 5)]:
                             if (bbox[0] >= t_bbox[0] - 5 and bbox[2] <= t_bbox[2] + 5 and
-                                bbox[1] >= t_bbox[1] - 5 and bbox[3] <= t_bbox[3] + 5):
+                                bbox[3] <= t_bbox[3] + 5):
                                 is_in_table = True
                                 break
                     
@@ -1001,7 +1253,7 @@ class EnhancedDocumentParser:
                         continue
                     
                     # 优化: 使用集合查找代替列表查找
-                    if block_idx in table_block_indices_set:
+                    if block_idx in table_block_indices:
                         # 只在第一个表格块处插入检测到的表格
                         if block_idx == min_table_block_idx and detected_tables:
                             content_blocks.append({
@@ -1011,35 +1263,25 @@ class EnhancedDocumentParser:
                                 'sort_key': (y_pos, block_idx)
                             })
                     else:
-                        # 优化: 简化文本提取逻辑
-                        text_parts = []
-                        for line in block.get("lines", []):
-                            spans = line.get("spans", [])
-                            if spans:
-                                text = " ".join(span.get("text", "").strip() for span in spans).strip()
-                                if text:
-                                    text_parts.append(text)
-                        
-                        if text_parts:
+                        text = _block_text(block)
+                        if text:
                             content_blocks.append({
                                 'type': 'text',
-                                'content': " ".join(text_parts),
+                                'content': text,
                                 'y_pos': y_pos,
                                 'sort_key': (y_pos, block_idx)
                             })
-                
-                elif block_type == 1:  # 图片块
-                    if image_idx < len(images):
-                        bbox = block.get("bbox", [0, 0, 0, 0])
-                        y_pos = bbox[1]
-                        img_info = images[image_idx]
-                        content_blocks.append({
-                            'type': 'image',
-                            'content': f"![图片]({img_info['url']})",
-                            'y_pos': y_pos,
-                            'sort_key': (y_pos, block_idx)
-                        })
-                        image_idx += 1
+            
+            # 图片块按文档顺序与提取到的图片一一对应，多余的图片块或图片忽略
+            image_blocks = [(block_idx, block) for block_idx, block in enumerate(blocks) if block.get("type") == 1]
+            for (block_idx, block), img_info in zip(image_blocks, images):
+                y_pos = block.get("bbox", [0, 0, 0, 0])[1]
+                content_blocks.append({
+                    'type': 'image',
+                    'content': f"![图片]({img_info['url']})",
+                    'y_pos': y_pos,
+                    'sort_key': (y_pos, block_idx)
+                })
             
             # 按Y坐标和块索引排序
             content_blocks.sort(key=lambda x: x['sort_key'])
@@ -1052,27 +1294,47 @@ class EnhancedDocumentParser:
     # 保留旧方法以向后兼容
     def _get_ordered_content_blocks(self, page, tables, images) -> List[Dict]:
         """获取按位置排序的内容块（兼容旧版本）"""
-        page_dict = page.get_text("dict")
+        page_dict = self._get_page_dict(page)
         return self._get_ordered_content_blocks_optimized(page_dict, tables, images)
     
-    def _extract_non_table_text(self, page) -> str:
+    def _get_page_dict(self, page) -> Dict:
+        """返回page.get_text("dict")的结果，同一页面对象只提取一次"""
+        page_dict = self._page_dicts.get(page)
+        if page_dict is None:
+            page_dict = page.get_text("dict")
+            self._page_dicts[page] = page_dict
+        return page_dict
+    
+    def _plain_text_from_dict(self, page_dict: Dict) -> str:
+        """由get_text("dict")的结果重建page.get_text()的纯文本（每个文本行一行）"""
+        parts = []
+        for block in page_dict.get('blocks', []):
+            if block.get('type') != 0:
+                continue
+            for line in block.get('lines', []):
+                for span in line.get('spans', []):
+                    parts.append(span.get('text', ''))
+                parts.append('\n')
+        return ''.join(parts)
+    
+    def _extract_non_table_text(self, page, table_block_indices: FrozenSet[int] = frozenset(),
+                                page_dict: Dict = None) -> str:
         """提取非表格区域的文本"""
         try:
-            blocks = page.get_text("dict")["blocks"]
+            if page_dict is None:
+                page_dict = self._get_page_dict(page)
+            blocks = page_dict["blocks"]
             non_table_texts = []
             
             for block_idx, block in enumerate(blocks):
                 # 跳过表格块
-                if block_idx in self._last_table_block_indices:
+                if block_idx in table_block_indices:
                     continue
                 
                 if block.get("type") == 0:  # 文本块
-                    for line in block.get("lines", []):
-                        spans = line.get("spans", [])
-                        if spans:
-                            text = " ".join(span.get("text", "").strip() for span in spans).strip()
-                            if text:
-                                non_table_texts.append(text)
+                    text = _block_text(block)
+                    if text:
+                        non_table_texts.append(text)
             
             return " ".join(non_table_texts) if non_table_texts else ""
         except Exception as e:
@@ -1098,25 +1360,30 @@ class EnhancedDocumentParser:
             return dt.isoformat()
         return str(dt)
 
-    def _cell_to_text(self, cell, wb_epoch) -> str:
-        """尽量按单元格格式输出，修复日期显示为数字的问题。"""
+    def _cell_to_text(self, cell, wb_epoch, from_excel) -> str:
+        """尽量按单元格格式输出，修复日期显示为数字的问题（from_excel由_parse_xlsx导入一次后传入）。"""
         v = cell.value
         if v is None:
             return ""
 
+        # 文本单元格最常见，直接返回
+        if isinstance(v, str):
+            return v
+
+        is_number = isinstance(v, (int, float))
+
         # 直接标记为日期的单元格
         if cell.is_date:
-            if isinstance(v, (int, float)):
+            if is_number:
                 try:
                     v = from_excel(v, wb_epoch)
                 except Exception:
                     pass
             return self._format_dt(v)
 
-        # 数值但格式看起来像日期/时间
-        if isinstance(v, (int, float)):
-            fmt = (cell.number_format or "").lower()
-            if any(token in fmt for token in ("yy", "dd", "mm", "hh", "ss")):
+        # 数值但格式看起来像日期/时间（格式判断结果按格式字符串缓存）
+        if is_number:
+            if _is_date_number_format(cell.number_format or ""):
                 try:
                     dt = from_excel(v, wb_epoch)
                     return self._format_dt(dt)
@@ -1137,10 +1404,14 @@ class EnhancedDocumentParser:
     def _parse_xlsx(self, file_path: str) -> Dict:
         """解析xlsx文件"""
         try:
-            if openpyxl is None:
+            try:
+                from openpyxl import load_workbook
+                from openpyxl.utils.datetime import from_excel
+            except ImportError:
                 raise ImportError("需要安装openpyxl库来解析xlsx文件")
             
-            workbook = load_workbook(filename=file_path, data_only=True)
+            # 只读模式按行流式读取单元格，不在内存中构建整个工作簿
+            workbook = load_workbook(filename=file_path, data_only=True, read_only=True, keep_links=False)
             wb_epoch = workbook.epoch
             markdown_content = []
             images_info = []
@@ -1159,22 +1430,28 @@ class EnhancedDocumentParser:
                 sheet = workbook[sheet_name]
                 # 移除工作表标题，直接处理数据
                 
-                # 获取有数据的范围
-                if sheet.max_row == 1 and sheet.max_column == 1:
-                    # 空工作表跳过，不添加提示
-                    continue
+                # 只读模式会信任文件中记录的<dimension>，该记录过期时会截断或整个跳过数据；
+                # 忽略它，按实际存在的行读取
+                sheet.reset_dimensions()
                 
-                # 转换为表格格式
+                # 转换为表格格式，各行长度不一时由_convert_list_to_markdown_table补齐
                 table_data = []
-                for row in sheet.iter_rows(min_row=1, max_row=sheet.max_row, 
-                                         min_col=1, max_col=sheet.max_column):
+                row_count = 0
+                max_cols = 0
+                for row in sheet.iter_rows(min_row=1, min_col=1):
+                    row_count += 1
+                    max_cols = max(max_cols, len(row))
                     # 使用新的单元格处理函数，支持日期格式
-                    row_values = [self._cell_to_text(cell, wb_epoch) for cell in row]
+                    row_values = [self._cell_to_text(cell, wb_epoch, from_excel) for cell in row]
                     
                     # 过滤掉完全为空的行
                     if any(cell.strip() for cell in row_values):
                         table_data.append(row_values)
                 
+                # 实际只有一行一列（或没有任何单元格）的工作表视为空表跳过，不添加提示
+                if row_count <= 1 and max_cols <= 1:
+                    continue
+                
                 if table_data:
                     markdown_content.extend(self._convert_list_to_markdown_table(table_data))
                     markdown_content.append("")
@@ -1186,6 +1463,10 @@ class EnhancedDocumentParser:
                             markdown_content.append(f"![{img_info['filename']}]({img_info['url']})")
                         markdown_content.append("")
             
+            sheet_count = len(workbook.sheetnames)
+            # 只读模式会保持文件句柄打开，需显式关闭
+            workbook.close()
+            
             result_markdown = self._clean_markdown(markdown_content)
             
             return {
@@ -1198,7 +1479,7 @@ class EnhancedDocumentParser:
                 "file_info": {
                     "name": Path(file_path).name,
                     "size": Path(file_path).stat().st_size,
-                    "sheets": len(workbook.sheetnames)
+                    "sheets": sheet_count
                 }
             }
             
@@ -1221,6 +1502,7 @@ class EnhancedDocumentParser:
         # xlrd中，ctype=3表示日期类型
         if cell.ctype == 3:  # XL_CELL_DATE
             try:
+                from xlrd import xldate_as_datetime
                 dt = xldate_as_datetime(cell.value, datemode)
                 return self._format_dt(dt)
             except Exception:
@@ -1231,7 +1513,9 @@ class EnhancedDocumentParser:
     def _parse_xls(self, file_path: str) -> Dict:
         """解析xls文件"""
         try:
-            if xlrd is None:
+            try:
+                import xlrd
+            except ImportError:
                 raise ImportError("需要安装xlrd库来解析xls文件")
             
             workbook = xlrd.open_workbook(file_path, formatting_info=False)
@@ -1260,13 +1544,9 @@ class EnhancedDocumentParser:
                 
                 # 转换为表格格式
                 table_data = []
-                for row_idx in range(sheet.nrows):
-                    row_data = []
-                    for col_idx in range(sheet.ncols):
-                        cell = sheet.cell(row_idx, col_idx)
-                        # 使用新的单元格处理函数，支持日期格式
-                        cell_value = self._xls_cell_to_text(cell, datemode)
-                        row_data.append(cell_value)
+                for row_cells in sheet.get_rows():
+                    # 整行取出单元格，使用新的单元格处理函数，支持日期格式
+                    row_data = [self._xls_cell_to_text(cell, datemode) for cell in row_cells]
                     
                     # 过滤掉完全为空的行
                     if any(cell.strip() for cell in row_data):
@@ -1313,13 +1593,19 @@ class EnhancedDocumentParser:
     def _parse_pptx(self, file_path: str) -> Dict:
         """解析pptx文件"""
         try:
-            if Presentation is None:
+            try:
+                from pptx import Presentation
+            except ImportError:
                 raise ImportError("需要安装python-pptx库来解析pptx文件")
             
             prs = Presentation(file_path)
             markdown_content = []
             images_info = []
             
+            # 循环中用到的属性提前绑定到局部变量
+            save_dir = self.image_save_dir
+            url_prefix = f"{self.image_base_url}/static/images/"
+            
             logger.info(f"PPTX文件包含{len(prs.slides)}张幻灯片")
             
             for slide_idx, slide in enumerate(prs.slides, 1):
@@ -1338,12 +1624,11 @@ class EnhancedDocumentParser:
                             image_bytes = image.blob
                             image_ext = self._get_image_extension(image_bytes)
                             image_filename = f"{uuid.uuid4()}.{image_ext}"
-                            image_path = self.image_save_dir / image_filename
+                            image_path = save_dir / image_filename
                             
-                            with open(image_path, 'wb') as f:
-                                f.write(image_bytes)
+                            image_path.write_bytes(image_bytes)
                             
-                            image_url = f"{self.image_base_url}/static/images/{image_filename}"
+                            image_url = url_prefix + image_filename
                             images_info.append({
                                 "filename": image_filename,
                                 "url": image_url,
@@ -1404,19 +1689,19 @@ class EnhancedDocumentParser:
                 # 补齐列数
                 normalized_row = row + [""] * (max_cols - len(row))
                 # 清理单元格内容
-                cleaned_row = [str(cell).replace('\n', '<br>').replace('|', '\\|') for cell in normalized_row]
+                cleaned_row = [str(cell).translate(_CELL_TRANS) for cell in normalized_row]
                 normalized_data.append(cleaned_row)
             
             # 生成表头
             if normalized_data:
                 headers = normalized_data[0] if len(normalized_data) > 1 else [f"列{i+1}" for i in range(max_cols)]
-                markdown_table.append("| " + " | ".join(headers) + " |")
-                markdown_table.append("| " + " | ".join(["---"] * len(headers)) + " |")
+                fmt = _row_template(max_cols)
+                markdown_table.append(fmt.format(*headers))
+                markdown_table.append(fmt.format(*["---"] * max_cols))
                 
                 # 生成数据行
                 data_rows = normalized_data[1:] if len(normalized_data) > 1 else normalized_data
-                for row in data_rows:
-                    markdown_table.append("| " + " | ".join(row) + " |")
+                markdown_table.extend(fmt.format(*row) for row in data_rows)
             
         except Exception as e:
             logger.warning(f"表格转换失败: {str(e)}")
@@ -1424,91 +1709,148 @@ class EnhancedDocumentParser:
         
         return markdown_table
 
-    def _extract_xlsx_images(self, file_path: str) -> List[Dict]:
-        """从xlsx文件中提取图片"""
+    def _extract_xlsx_images(self, file_path: str, cache_source: Optional[str] = None) -> List[Dict]:
+        """
+        从xlsx文件中提取图片（媒体文件较多时多线程解压，结果保持zip中的顺序）
+        
+        cache_source: 图片缓存按此文件（默认为file_path）的路径和修改时间区分工作簿；
+            file_path是每次新生成的临时文件时传入其源文件，否则缓存条目永远不会再命中，只会挤掉有效条目
+        """
         images_info = []
         
         try:
-            import zipfile
-            from xml.etree import ElementTree as ET
-            
             # xlsx文件本质上是一个zip文件
             with zipfile.ZipFile(file_path, 'r') as zip_file:
-                # 查找所有媒体文件
-                media_files = [name for name in zip_file.namelist() 
-                              if name.startswith('xl/media/') and 
-                              any(name.lower().endswith(ext) for ext in ['.png', '.jpg', '.jpeg', '.gif', '.bmp', '.webp'])]
+                # 查找所有媒体文件：只遍历一次zip目录，保留条目信息和匹配出的扩展名，无需再按名称查找或解析
+                # （工作表与图片的对应关系暂不解析，不再读取工作表关系文件）
+                media_infos = [(info, match['ext'].lower()) for info in zip_file.infolist()
+                               if (match := _XLSX_MEDIA_RE.match(info.filename))]
                 
-                logger.info(f"在XLSX文件中发现{len(media_files)}个媒体文件")
+                # 每个媒体文件都用到的属性提前取出，作为参数传入
+                cache_source = cache_source or file_path
+                stat = os.stat(cache_source)
+                workbook_key = (os.path.realpath(cache_source), stat.st_mtime_ns, stat.st_size)
+                save_dir = self.image_save_dir
+                url_prefix = f"{self.image_base_url}/static/images/"
+                extract_media = self._extract_xlsx_media
                 
-                # 尝试解析工作表和图片的关系(可选,如果失败就不添加sheet信息)
-                sheet_image_mapping = {}
-                try:
-                    # 读取工作表关系文件
-                    for sheet_rel in [name for name in zip_file.namelist() if 'xl/worksheets/_rels/' in name]:
-                        sheet_name = sheet_rel.split('/')[-1].replace('.rels', '')
-                        content = zip_file.read(sheet_rel)
-                        # 这里可以解析XML获取图片关系,但较复杂,暂时简化处理
-                except:
-                    pass
-                
-                for media_file in media_files:
+                workers = min(len(media_infos), os.cpu_count() or 1, _MAX_MEDIA_WORKERS)
+                if len(media_infos) < _PARALLEL_MEDIA_MIN or workers < 2:
+                    results = [extract_media(zip_file, media_info, original_ext, save_dir, url_prefix, workbook_key)
+                               for media_info, original_ext in media_infos]
+                else:
+                    # 解压(zlib)和写文件时会释放GIL；ZipFile对象不能跨线程共享，每个线程打开自己的一份
+                    from concurrent.futures import ThreadPoolExecutor
+                    local = threading.local()
+                    opened = []
+                    
+                    def extract(item):
+                        thread_zip = getattr(local, "zip_file", None)
+                        if thread_zip is None:
+                            thread_zip = local.zip_file = zipfile.ZipFile(file_path, 'r')
+                            opened.append(thread_zip)
+                        return extract_media(thread_zip, *item, save_dir, url_prefix, workbook_key)
+                    
                     try:
-                        # 读取图片数据
-                        image_data = zip_file.read(media_file)
-                        
-                        if len(image_data) < 100:  # 跳过太小的图片
-                            continue
-                        
-                        # 生成唯一文件名
-                        image_id = str(uuid.uuid4())
-                        original_ext = Path(media_file).suffix.lower().lstrip('.')
-                        original_ext = original_ext.strip()
-                        image_filename = f"{image_id}.{original_ext}"
-                        image_path = self.image_save_dir / image_filename
-                        
-                        # 保存图片
-                        with open(image_path, 'wb') as f:
-                            f.write(image_data)
-                        
-                        # 验证图片是否有效
-                        if self._validate_image(image_path):
-                            # 生成访问URL
-                            image_url = f"{self.image_base_url}/static/images/{image_filename}"
-                            
-                            images_info.append({
-                                "filename": image_filename,
-                                "path": str(image_path),
-                                "url": image_url,
-                                "size": len(image_data),
-                                "format": original_ext,
-                                "source": media_file
-                            })
-                            logger.info(f"成功提取图片: {media_file}")
-                        else:
-                            # 删除无效图片
-                            os.remove(image_path)
-                            logger.warning(f"无效图片已删除: {media_file}")
-                            
-                    except Exception as e:
-                        logger.warning(f"处理XLSX图片{media_file}时出错: {str(e)}")
+                        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="xlsx-media") as executor:
+                            results = list(executor.map(extract, media_infos))
+                    finally:
+                        for thread_zip in opened:
+                            thread_zip.close()
+                
+                images_info = [image_info for image_info in results if image_info]
+                # 逐个图片的日志只在DEBUG级别输出，这里汇总一条
+                logger.info("XLSX中发现%d个媒体文件，提取%d张图片，跳过%d个",
+                            len(media_infos), len(images_info), len(media_infos) - len(images_info))
                         
         except Exception as e:
             logger.error(f"XLSX图片提取失败: {str(e)}")
             
         return images_info
+    
+    def _extract_xlsx_media(self, zip_file, media_info, original_ext: str,
+                            save_dir: Path, url_prefix: str,
+                            workbook_key: Tuple[str, int, int]) -> Optional[Dict]:
+        """提取xlsx中的单个媒体文件到save_dir，返回图片信息，跳过或失败时返回None"""
+        media_file = media_info.filename
+        try:
+            # 按zip目录中的大小判断，不把图片整体读入内存
+            if media_info.file_size < 100:  # 跳过太小的图片
+                return None
+            
+            # 同一个未修改的工作簿中的同一成员之前已提取且文件仍在时直接复用，无需解压和验证
+            cache_key = (*workbook_key, media_file, media_info.CRC)
+            with self._xlsx_image_cache_lock:
+                image_filename = self._xlsx_image_cache.get(cache_key)
+                if image_filename:
+                    self._xlsx_image_cache.move_to_end(cache_key)
+            if image_filename and (save_dir / image_filename).is_file():
+                image_path = save_dir / image_filename
+                image_ext = image_path.suffix[1:]
+            else:
+                # 写入前直接在zip流上验证图片，无效图片不落盘；扩展名按文件头确定（zip中的扩展名可能与内容不符），
+                # 无法识别文件头时交给PIL验证并沿用原扩展名
+                with zip_file.open(media_info) as src:
+                    image_ext = _image_format_from_magic(src.read(16))
+                    if image_ext is None:
+                        src.seek(0)
+                        if not self._validate_image_stream(src):
+                            logger.debug("跳过无效图片: %s", media_file)
+                            return None
+                        image_ext = original_ext
+                    
+                    # 生成唯一文件名，从流开头解压到文件
+                    image_filename = f"{uuid.uuid4()}.{image_ext}"
+                    image_path = save_dir / image_filename
+                    # 未压缩的成员由内核直接从xlsx复制到目标文件；其余按64KB块整块写入，
+                    # 不需要缓冲层：直接使用无缓冲的原始文件对象
+                    with open(image_path, 'wb', buffering=0) as dst:
+                        if not _sendfile_stored_member(zip_file, media_info, dst):
+                            src.seek(0)
+                            shutil.copyfileobj(src, dst, 65536)
+                with self._xlsx_image_cache_lock:
+                    self._xlsx_image_cache[cache_key] = image_filename
+                    if len(self._xlsx_image_cache) > _XLSX_IMAGE_CACHE_SIZE:
+                        self._xlsx_image_cache.popitem(last=False)
+            
+            # 生成访问URL
+            image_url = url_prefix + image_filename
+            logger.debug("成功提取图片: %s", media_file)
+            
+            return {
+                "filename": image_filename,
+                "path": str(image_path),
+                "url": image_url,
+                "size": media_info.file_size,
+                "format": image_ext,
+                "source": media_file
+            }
+            
+        except Exception as e:
+            logger.warning(f"处理XLSX图片{media_file}时出错: {str(e)}")
+            return None
 
     def _extract_xls_images(self, file_path: str) -> List[Dict]:
-        """从xls文件中提取图片 - 注意：xls格式图片提取相对困难"""
+        """从xls文件中提取图片：xls不是基于XML的格式，借助LibreOffice转换为xlsx后按xlsx提取"""
         images_info = []
         
         try:
-            # 对于xls文件，图片提取比较复杂，因为它不是基于XML的格式
-            # 这里我们尝试一个简单的方法，但成功率可能不高
-            logger.warning("XLS格式的图片提取功能有限，建议使用XLSX格式以获得更好的图片支持")
+            if not self.doc_converter:
+                logger.warning("XLS图片提取需要LibreOffice转换，建议使用XLSX格式以获得更好的图片支持")
+                return images_info
+            
+            # 没有图片的xls不必为此启动LibreOffice
+            if not _xls_has_pictures(file_path):
+                logger.debug("XLS中没有图片，跳过转换: %s", file_path)
+                return images_info
             
-            # 尝试使用openpyxl转换（如果可能的话）
-            # 但通常xls文件需要先转换为xlsx才能很好地提取图片
+            with tempfile.TemporaryDirectory(prefix="xls2xlsx_") as temp_dir:
+                success, result = self.doc_converter.convert_xls_to_xlsx(file_path, temp_dir)
+                if not success:
+                    logger.warning(f"XLS转换为XLSX失败，跳过图片提取: {result}")
+                    return images_info
+                # 图片写入image_save_dir，临时的xlsx文件随目录一起删除；图片缓存按源xls区分
+                images_info = self._extract_xlsx_images(result, cache_source=file_path)
             
         except Exception as e:
             logger.error(f"XLS图片提取失败: {str(e)}")